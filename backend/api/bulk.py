@@ -0,0 +1,170 @@
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from api.messages import BULK_IDS_ERR
+from recipes.counters import update_counters
+from recipes.feed import push_authors, remove_authors
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, User
+from recipes.shopping_cart import (apply_cart_deltas, lock_recipes,
+                                   recipe_deltas)
+from users.models import Subscription
+
+ADDED = 'added'
+ALREADY_ADDED = 'already_added'
+REMOVED = 'removed'
+NOT_ADDED = 'not_added'
+NOT_FOUND = 'not_found'
+YOURSELF = 'yourself'
+
+COUNTER_FIELDS = {
+    FavoriteRecipe: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+def get_bulk_ids(request, field):
+    """Возвращает id из поля field тела запроса без повторов
+    в исходном порядке.
+    """
+    ids = request.data.get(field) if isinstance(request.data, dict) else None
+    if (
+        not isinstance(ids, list)
+        or not 0 < len(ids) <= settings.BULK_ACTION_MAX_ITEMS
+        or not all(
+            isinstance(pk, int) and not isinstance(pk, bool) for pk in ids
+        )
+    ):
+        raise ValidationError({field: BULK_IDS_ERR})
+    return list(dict.fromkeys(ids))
+
+
+def bulk_results(ids, statuses):
+    """Результат обработки каждого id в порядке запроса."""
+    return {'results': [{'id': pk, 'status': statuses[pk]} for pk in ids]}
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+def insert_links(model, field, user, ids, exclude=None):
+    """Связывает пользователя с существующими объектами ids через поле
+    field модели model одним запросом INSERT ... SELECT ... ON CONFLICT
+    DO NOTHING RETURNING.
+
+    Возвращает ключи объектов, связь с которыми создана именно этим
+    запросом: из одновременных запросов связь достается одному,
+    остальные получают пустой результат вместо IntegrityError.
+    """
+    meta = model._meta
+    target = meta.get_field(field)
+    target_meta = target.related_model._meta
+    pk = quote(target_meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(ids))
+    where = f'{pk} IN ({placeholders})'
+    params = [user.pk, *ids]
+    if exclude is not None:
+        where += f' AND {pk} <> %s'
+        params.append(exclude)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(meta.db_table)} '
+            f'({quote(meta.get_field("user").column)}, '
+            f'{quote(target.column)}) '
+            f'SELECT %s, {pk} FROM {quote(target_meta.db_table)} '
+            f'WHERE {where} '
+            f'ON CONFLICT DO NOTHING RETURNING {quote(target.column)}',
+            params
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_links(model, field, user, ids):
+    """Удаляет связи пользователя с объектами ids одним запросом
+    DELETE ... RETURNING и возвращает ключи объектов, связь с которыми
+    удалена именно этим запросом.
+    """
+    meta = model._meta
+    column = quote(meta.get_field(field).column)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(meta.db_table)} '
+            f'WHERE {quote(meta.get_field("user").column)} = %s '
+            f'AND {column} IN ({placeholders}) RETURNING {column}',
+            [user.pk, *ids]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def existing(model, pks):
+    if not pks:
+        return set()
+    return set(model.objects.filter(pk__in=pks).values_list('pk', flat=True))
+
+
+@transaction.atomic
+def add_recipes(model, user, ids):
+    """Добавляет рецепты в избранное или корзину одним запросом.
+
+    Сигналы при этом не отправляются, поэтому счетчики рецептов
+    и суммы ингредиентов в корзине обновляются здесь же и только
+    для действительно добавленных рецептов.
+    """
+    if model is ShoppingCart:
+        lock_recipes(ids)
+    new = insert_links(model, 'recipe', user, ids)
+    if new:
+        update_counters(
+            Recipe, new, COUNTER_FIELDS[model], 1, similar_outdated=True
+        )
+        if model is ShoppingCart:
+            apply_cart_deltas((user.id,), recipe_deltas(new))
+    found = existing(Recipe, set(ids) - new)
+    return {
+        pk: ADDED if pk in new else ALREADY_ADDED if pk in found
+        else NOT_FOUND
+        for pk in ids
+    }
+
+
+@transaction.atomic
+def remove_recipes(model, user, ids):
+    """Удаляет рецепты из избранного или корзины одним запросом."""
+    if model is ShoppingCart:
+        lock_recipes(ids)
+    removed = delete_links(model, 'recipe', user, ids)
+    if removed:
+        if model is ShoppingCart:
+            apply_cart_deltas((user.id,), recipe_deltas(removed, -1))
+        update_counters(
+            Recipe, removed, COUNTER_FIELDS[model], -1,
+            similar_outdated=True
+        )
+    return {pk: REMOVED if pk in removed else NOT_ADDED for pk in ids}
+
+
+@transaction.atomic
+def subscribe_users(user, ids):
+    """Подписывает пользователя на авторов ids одним запросом."""
+    new = insert_links(Subscription, 'subscribed', user, ids, user.pk)
+    if new:
+        update_counters(User, new, 'followers_count', 1)
+        push_authors(user.id, new)
+    found = existing(User, set(ids) - new - {user.pk})
+    return {
+        pk: YOURSELF if pk == user.pk else ADDED if pk in new
+        else ALREADY_ADDED if pk in found else NOT_FOUND
+        for pk in ids
+    }
+
+
+@transaction.atomic
+def unsubscribe_users(user, ids):
+    """Отписывает пользователя от авторов ids одним запросом."""
+    removed = delete_links(Subscription, 'subscribed', user, ids)
+    if removed:
+        update_counters(User, removed, 'followers_count', -1)
+        remove_authors(user.id, removed)
+    return {pk: REMOVED if pk in removed else NOT_ADDED for pk in ids}
@@ -0,0 +1,82 @@
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.checks import Tags, Warning, register
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from recipes.cache import get_model_version
+
+CACHED_RESPONSE_KEY = 'api_response:{}'
+PROCESS_LOCAL_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Предупреждает о кеше в памяти процесса: версии моделей, от которых
+    зависят ETag и закешированные ответы, не увидят изменений, сделанных
+    командами загрузки данных и другими процессами сервера.
+    """
+    if settings.CACHES['default']['BACKEND'] != PROCESS_LOCAL_CACHE:
+        return []
+    return [Warning(
+        'Кеш LocMemCache не общий для процессов: ответы со списками '
+        'и их ETag не обновятся после загрузки данных командами.',
+        hint='Задайте CACHE_BACKEND с общим кешем, например '
+             'FileBasedCache, Memcached или Redis.',
+        id='api.W001',
+    )]
+
+
+def cache_list_response(list_method):
+    """Кеширует отрендеренный JSON ответа со списком объектов модели
+    и отвечает 304 Not Modified по заголовкам ETag и Last-Modified.
+    Ключ кеша зависит от версии модели, поэтому при изменении данных
+    ответы формируются заново. Версия хранится в общем кеше и меняется
+    и при загрузке данных командами, если кеш не LocMemCache. Процесс
+    перечитывает ее не чаще раза в MODEL_VERSION_CHECK_INTERVAL секунд,
+    поэтому ответ 304 обычно не обращается к кешу вовсе.
+    """
+    @wraps(list_method)
+    def wrapper(self, request, *args, **kwargs):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, JSONRenderer):
+            return list_method(self, request, *args, **kwargs)
+        version = get_model_version(self.queryset.model)
+        key = md5(
+            f'{version}:{request.get_full_path()}'.encode()
+        ).hexdigest()
+        headers = {
+            'ETag': f'"{key}"',
+            'Last-Modified': http_date(version // 10 ** 9),
+        }
+        response = get_conditional_response(
+            request, etag=headers['ETag'], last_modified=version // 10 ** 9
+        )
+        if response is None:
+            content = cache.get(CACHED_RESPONSE_KEY.format(key))
+            if content is None:
+                response = list_method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                content = renderer.render(
+                    response.data, renderer.media_type,
+                    self.get_renderer_context()
+                )
+                cache.set(
+                    CACHED_RESPONSE_KEY.format(key), content,
+                    settings.API_CACHE_TIMEOUT
+                )
+            response = HttpResponse(
+                content, content_type=renderer.media_type
+            )
+        for header, value in headers.items():
+            response[header] = value
+        patch_cache_control(response, no_cache=True)
+        return response
+    return wrapper
@@ -1,27 +1,35 @@
-from django.db.models import Q
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import (Case, Exists, F, IntegerField, OuterRef, Q,
+                              Value, When)
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from recipes.search import SEARCH_CONFIG
 
 
 class IngredientFilter(FilterSet):
-    """Кастомный фильтр для поиска ингредиента по названию."""
-    name = filters.CharFilter(method='filter_name')
+    """Параметры поиска ингредиента по названию и ограничения числа
+    результатов. Поиск выполняет индекс ingredient_index, поэтому
+    фильтр только проверяет параметры и не меняет queryset.
+    """
+    name = filters.CharFilter()
+    limit = filters.NumberFilter(min_value=1)
 
     class Meta:
         model = Ingredient
-        fields = ('name',)
+        fields = ('name', 'limit')
 
-    def filter_name(self, queryset, name, value):
-        return queryset.filter(
-            Q(name__istartswith=value) | Q(name__icontains=value)
-        )
+    def filter_queryset(self, queryset):
+        return queryset
 
 
 class RecipeFilter(FilterSet):
     """Кастомный фильтр для поиска рецепта по автору,
-    тегу, подписке или наличию в корзине.
+    тегу, подписке или наличию в корзине, а также полнотекстового
+    поиска по названию, ингредиентам и описанию.
     """
+    search = filters.CharFilter(method='filter_search')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
@@ -29,7 +37,35 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'is_favorited', 'is_in_shopping_cart', 'search'
+        )
+
+    def filter_search(self, queryset, name, value):
+        """В PostgreSQL ищет по сохраненному поисковому вектору и
+        сортирует по релевантности. В остальных СУБД ищет подстроку,
+        выводя сначала совпадения в названии.
+        """
+        if connection.vendor == 'postgresql':
+            query = SearchQuery(
+                value, config=SEARCH_CONFIG, search_type='websearch'
+            )
+            return queryset.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)
+            ).order_by('-rank', '-pub_date', '-id')
+        return queryset.filter(
+            Q(name__icontains=value)
+            | Q(text__icontains=value)
+            | Exists(RecipeIngredient.objects.filter(
+                recipe=OuterRef('pk'), ingredient__name__icontains=value
+            ))
+        ).annotate(
+            is_name_match=Case(
+                When(name__icontains=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('is_name_match', '-pub_date', '-id')
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -0,0 +1,64 @@
+import threading
+from bisect import bisect_left
+
+from recipes.cache import get_model_version
+from recipes.models import Ingredient
+
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для поиска по названию.
+
+    Хранит отсортированный по названию список ингредиентов: поиск по
+    началу названия выполняется бинарным поиском, по вхождению строки -
+    перебором оставшихся названий. Индекс перестраивается, когда меняется
+    версия модели Ingredient. Версия читается из общего кеша не чаще раза
+    в MODEL_VERSION_CHECK_INTERVAL секунд, поэтому изменения из других
+    процессов попадают в индекс с такой задержкой.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = []
+        self._items = []
+
+    def _refresh(self):
+        version = get_model_version(Ingredient)
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            items = sorted(
+                Ingredient.objects.values('id', 'name', 'measurement_unit'),
+                key=lambda item: (item['name'].lower(), item['id'])
+            )
+            self._keys = [item['name'].lower() for item in items]
+            self._items = items
+            self._version = version
+
+    def search(self, name=None, limit=None):
+        """Возвращает ингредиенты, название которых начинается с name,
+        а за ними те, в названии которых name встречается.
+        """
+        self._refresh()
+        keys, items = self._keys, self._items
+        if not name:
+            return items[:limit]
+        name = name.lower()
+        start = bisect_left(keys, name)
+        end = bisect_left(keys, name + PREFIX_UPPER_BOUND, start)
+        result = items[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+        for position, key in enumerate(keys):
+            if start <= position < end or name not in key:
+                continue
+            result.append(items[position])
+            if limit is not None and len(result) >= limit:
+                break
+        return result
+
+
+ingredient_index = IngredientIndex()
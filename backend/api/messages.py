@@ -6,6 +6,7 @@ INGRED_REPEAT_ERR = {
 INGRED_NOT_FOUND_ERR = {
     'ingredients': 'У рецепта должен быть минимум 1 ингредиент!'
 }
+INGRED_DOES_NOT_EXIST_ERR = 'Ингредиента с id={} не существует!'
 INGRED_AMOUNT_ERR = (
     'Количество ингредиента должно быть от '
     f'{settings.INGRED_MIN_AMOUNT} до {settings.INGRED_MAX_AMOUNT}'
@@ -20,6 +21,7 @@ TAG_REPEAT_ERR = {
     'tags': 'Теги в списке не должны повторяться!'
 }
 TAG_NOT_FOUND_ERR = {'tags': 'У рецепта должен быть минимум 1 тег!'}
+TAG_DOES_NOT_EXIST_ERR = 'Тега с id={} не существует!'
 
 RECIPE_ALR_ADDED_ERR = {'errors': 'Вы уже добавили данный рецепт!'}
 RECIPE_NOT_ADDED_ERR = {'errors': 'Вы не добавляли данный рецепт!'}
@@ -29,3 +31,33 @@ SUBSCR_NOT_YOURSELF_ERR = {'errors': 'Нельзя подписаться на 
 SUBSCR_NOT_FOUND_ERR = {
     'errors': 'Вы не были подписаны на этого пользователя!'
 }
+SHOPPING_LIST_PDF_FONT_ERR = {
+    'errors': 'Список покупок в формате PDF временно недоступен'
+}
+RECIPES_LIMIT_ERR = {
+    'recipes_limit': 'Значение должно быть целым положительным числом!'
+}
+
+COOKABLE_INGREDIENTS_ERR = {
+    'ingredients': 'Укажите id имеющихся ингредиентов целыми числами!'
+}
+
+BULK_IDS_ERR = (
+    'Передайте список id целыми числами, '
+    f'не более {settings.BULK_ACTION_MAX_ITEMS}'
+)
+
+INVALID_CURSOR_ERR = 'Неверный курсор пагинации'
+CURSOR_SEARCH_ERR = {
+    'pagination': 'Результаты поиска выводятся только постранично'
+}
+
+IMAGE_INVALID_ERR = 'Загрузите корректное изображение в формате base64'
+IMAGE_SIZE_ERR = (
+    'Размер изображения не должен превышать '
+    f'{settings.RECIPE_IMAGE_MAX_SIZE // (1024 * 1024)} МБ'
+)
+IMAGE_DIMENSIONS_ERR = (
+    'Ширина и высота изображения не должны превышать '
+    f'{settings.RECIPE_IMAGE_MAX_DIMENSION} пикселей'
+)
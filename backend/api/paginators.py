@@ -1,5 +1,201 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as DecodeError
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from api.messages import CURSOR_SEARCH_ERR, INVALID_CURSOR_ERR
+from recipes.feed import feed_positions
+
+
+PAGINATION_COUNT_KEY = 'pagination_count:{}'
+
+
+class CachedCountPaginator(Paginator):
+    """Пагинатор, не выполняющий COUNT(*) на каждый запрос.
+
+    Для списка без фильтров в PostgreSQL используется оценка количества
+    строк из pg_class, если таблица больше PAGINATION_ESTIMATE_THRESHOLD.
+    Иначе количество кешируется по тексту SQL-запроса на
+    PAGINATION_COUNT_CACHE_TIMEOUT секунд. При PAGINATION_EXACT_COUNT
+    количество всегда считается точно.
+    """
+    count_is_exact = True
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if settings.PAGINATION_EXACT_COUNT or not isinstance(
+            queryset, QuerySet
+        ):
+            return self.exact_count()
+        estimate = self.estimated_count(queryset)
+        if estimate is not None:
+            self.count_is_exact = False
+            return estimate
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = PAGINATION_COUNT_KEY.format(
+            md5(f'{queryset.db}:{sql}:{params}'.encode()).hexdigest()
+        )
+        count = cache.get(key)
+        if count is not None:
+            self.count_is_exact = False
+            return count
+        count = self.exact_count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def exact_count(self):
+        self.count_is_exact = True
+        if isinstance(self.object_list, QuerySet):
+            return self.object_list.count()
+        return len(self.object_list)
+
+    @staticmethod
+    def estimated_count(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql' or queryset.query.where:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                (queryset.model._meta.db_table,)
+            )
+            row = cursor.fetchone()
+        if row and row[0] >= settings.PAGINATION_ESTIMATE_THRESHOLD:
+            return int(row[0])
+        return None
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self.count_is_exact:
+                raise
+        self.count = self.exact_count()
+        self.__dict__.pop('num_pages', None)
+        return super().validate_number(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
 
 
 class LimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    django_paginator_class = CachedCountPaginator
+
+
+class RecipePagination(LimitPagination):
+    """Пагинация ленты рецептов. По умолчанию постраничная, а при
+    pagination=cursor - по ключу (pub_date, id) без OFFSET и без
+    подсчета общего количества рецептов. Результаты поиска упорядочены
+    по релевантности, а не по ключу, поэтому курсор с поиском не
+    сочетается.
+    """
+    mode_query_param = 'pagination'
+    cursor_mode = 'cursor'
+    cursor_query_param = 'cursor'
+    cursor_separator = '|'
+    ranked_query_params = ('search',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            request.query_params.get(self.mode_query_param)
+            == self.cursor_mode
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        if any(
+            request.query_params.get(param)
+            for param in self.ranked_query_params
+        ):
+            raise ValidationError(CURSOR_SEARCH_ERR)
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-pub_date', '-id')
+        position = self.decode_cursor(request)
+        if position:
+            pub_date, id = position
+            queryset = queryset.filter(
+                Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=id)
+            )
+        page = list(queryset[:page_size + 1])
+        self.next_position = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_position = (page[-1].pub_date, page[-1].id)
+        return page
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'results': data,
+        })
+
+    def get_next_cursor_link(self):
+        if self.next_position is None:
+            return None
+        pub_date, id = self.next_position
+        cursor = urlsafe_b64encode(
+            f'{pub_date.isoformat()}{self.cursor_separator}{id}'.encode()
+        ).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            pub_date, id = urlsafe_b64decode(
+                cursor.encode()
+            ).decode().split(self.cursor_separator)
+            pub_date, id = parse_datetime(pub_date), int(id)
+        except (DecodeError, UnicodeDecodeError, ValueError):
+            raise NotFound(INVALID_CURSOR_ERR)
+        if pub_date is None:
+            raise NotFound(INVALID_CURSOR_ERR)
+        return pub_date, id
+
+
+class FeedPagination(RecipePagination):
+    """Пагинация ленты подписок, всегда по ключу (pub_date, id).
+    Позиции рецептов страницы берутся из ленты пользователя, а сами
+    рецепты выбираются из queryset одним запросом по ключам.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = True
+        self.request = request
+        page_size = self.get_page_size(request)
+        positions = feed_positions(
+            request.user, page_size + 1, self.decode_cursor(request)
+        )
+        self.next_position = None
+        if len(positions) > page_size:
+            positions = positions[:page_size]
+            self.next_position = positions[-1]
+        recipes = queryset.in_bulk([id for _, id in positions])
+        return [recipes[id] for _, id in positions if id in recipes]
@@ -0,0 +1,286 @@
+import io
+import os
+import zlib
+from functools import lru_cache
+
+from fontTools import subset
+from fontTools.ttLib import TTFont, TTLibError
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+PAGE_MARGIN = 50
+FONT_SIZE = 12
+LINE_HEIGHT = 16
+TO_UNICODE_CHUNK_SIZE = 100
+# Символы, которые должны быть в шрифте списка покупок.
+REQUIRED_CHARS = 'АЯаяЁё'
+
+# Номера объектов, которые записываются в конце документа.
+CATALOG_ID = 1
+PAGES_ID = 2
+FONT_ID = 3
+CID_FONT_ID = 4
+FONT_DESCRIPTOR_ID = 5
+FONT_FILE_ID = 6
+TO_UNICODE_ID = 7
+FIRST_PAGE_ID = 8
+
+
+class PDFFontError(Exception):
+    """Шрифт для PDF не найден или не подходит."""
+
+
+class TrueTypeFont:
+    """Таблица символов и метрики TrueType-шрифта, необходимые для
+    разметки текста и встраивания шрифта в PDF.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.name = ''.join(
+            char for char in os.path.splitext(os.path.basename(path))[0]
+            if char.isalnum() or char in '-_'
+        )
+        try:
+            with TTFont(path, lazy=True) as font:
+                self._read_metrics(font)
+        except (OSError, TTLibError, AssertionError, KeyError) as error:
+            raise PDFFontError(
+                f'Не удалось загрузить шрифт {path}'
+            ) from error
+        if any(ord(char) not in self.cmap for char in REQUIRED_CHARS):
+            raise PDFFontError(f'В шрифте {path} нет кириллицы')
+
+    def _read_metrics(self, font):
+        if 'glyf' not in font:
+            raise PDFFontError(f'{self.path} не является TrueType-шрифтом')
+        head, hhea = font['head'], font['hhea']
+        self.scale = 1000 / head.unitsPerEm
+        self.bbox = [
+            round(value * self.scale)
+            for value in (head.xMin, head.yMin, head.xMax, head.yMax)
+        ]
+        self.ascent = round(hhea.ascent * self.scale)
+        self.descent = round(hhea.descent * self.scale)
+        glyph_order = font.getGlyphOrder()
+        metrics = font['hmtx'].metrics
+        self.widths = [
+            round(metrics[name][0] * self.scale) for name in glyph_order
+        ]
+        glyph_ids = {name: glyph for glyph, name in enumerate(glyph_order)}
+        self.cmap = {
+            code: glyph_ids[name]
+            for code, name in (font.getBestCmap() or {}).items()
+        }
+
+    def glyph(self, char):
+        return self.cmap.get(ord(char), 0)
+
+    def width(self, glyph):
+        return self.widths[glyph]
+
+    def subset(self, glyphs):
+        """Файл шрифта только с глифами glyphs. Номера глифов
+        сохраняются, поэтому уже записанные страницы остаются верными.
+        """
+        options = subset.Options()
+        options.retain_gids = True
+        options.notdef_outline = True
+        options.layout_features = []
+        options.drop_tables += ['FFTM']
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(gids=glyphs)
+        with TTFont(self.path) as font:
+            subsetter.subset(font)
+            data = io.BytesIO()
+            font.save(data)
+        return data.getvalue()
+
+
+@lru_cache(maxsize=None)
+def load_font(path):
+    """Загружает и проверяет шрифт один раз на процесс."""
+    return TrueTypeFont(path)
+
+
+class PDFStreamWriter:
+    """Потоковая запись текстового PDF-документа.
+
+    Страницы отдаются по мере заполнения, а объекты шрифта и
+    таблица перекрестных ссылок записываются в конце документа.
+    В памяти хранится только текущая страница, смещения объектов
+    и номера использованных глифов. Шрифт загружается при создании
+    писателя, поэтому ошибка PDFFontError возникает до начала ответа.
+    """
+    def __init__(self, font_path):
+        self.font = load_font(font_path)
+        self.offsets = {}
+        self.position = 0
+        self.page_ids = []
+        self.used_glyphs = {}
+        self.lines = []
+        self.next_id = FIRST_PAGE_ID
+
+    def _write(self, data):
+        self.position += len(data)
+        return data
+
+    def _object(self, object_id, body):
+        self.offsets[object_id] = self.position
+        return self._write(
+            f'{object_id} 0 obj\n'.encode() + body + b'\nendobj\n'
+        )
+
+    def _stream_object(self, object_id, data, extra=''):
+        return self._object(
+            object_id,
+            f'<< /Length {len(data)}{extra} >>\nstream\n'.encode()
+            + data + b'\nendstream'
+        )
+
+    def _encode(self, text):
+        glyphs = []
+        for char in text:
+            glyph = self.font.glyph(char)
+            self.used_glyphs.setdefault(glyph, char)
+            glyphs.append(f'{glyph:04X}')
+        return ''.join(glyphs)
+
+    def _wrap(self, text):
+        max_width = (PAGE_WIDTH - 2 * PAGE_MARGIN) * 1000 / FONT_SIZE
+        line, width = '', 0
+        for char in text:
+            char_width = self.font.width(self.font.glyph(char))
+            if line and width + char_width > max_width:
+                yield line
+                line, width = '', 0
+            line += char
+            width += char_width
+        yield line
+
+    def _page(self):
+        content = [
+            f'BT /F1 {FONT_SIZE} Tf {LINE_HEIGHT} TL '
+            f'{PAGE_MARGIN} {PAGE_HEIGHT - PAGE_MARGIN} Td'
+        ]
+        content.extend(f'<{self._encode(line)}> Tj T*' for line in self.lines)
+        content.append('ET')
+        self.lines = []
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.page_ids.append(page_id)
+        return self._stream_object(
+            content_id, zlib.compress('\n'.join(content).encode()),
+            ' /Filter /FlateDecode'
+        ) + self._object(page_id, (
+            f'<< /Type /Page /Parent {PAGES_ID} 0 R '
+            f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 {FONT_ID} 0 R >> >> '
+            f'/Contents {content_id} 0 R >>'
+        ).encode())
+
+    def start(self):
+        return self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+
+    def add_line(self, text):
+        """Добавляет строку текста, отдавая заполненные страницы."""
+        lines_per_page = (PAGE_HEIGHT - 2 * PAGE_MARGIN) // LINE_HEIGHT
+        for line in self._wrap(text):
+            self.lines.append(line)
+            if len(self.lines) >= lines_per_page:
+                yield self._page()
+
+    def _to_unicode(self):
+        glyphs = sorted(self.used_glyphs.items())
+        blocks = []
+        for start in range(0, len(glyphs), TO_UNICODE_CHUNK_SIZE):
+            chunk = glyphs[start:start + TO_UNICODE_CHUNK_SIZE]
+            blocks.append(f'{len(chunk)} beginbfchar')
+            blocks.extend(
+                f'<{glyph:04X}> <{char.encode("utf-16-be").hex().upper()}>'
+                for glyph, char in chunk
+            )
+            blocks.append('endbfchar')
+        return '\n'.join((
+            '/CIDInit /ProcSet findresource begin',
+            '12 dict begin',
+            'begincmap',
+            '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) '
+            '/Supplement 0 >> def',
+            '/CMapName /Adobe-Identity-UCS def',
+            '/CMapType 2 def',
+            '1 begincodespacerange',
+            '<0000> <FFFF>',
+            'endcodespacerange',
+            *blocks,
+            'endcmap',
+            'CMapName currentdict /CMap defineresource pop',
+            'end',
+            'end',
+        )).encode()
+
+    def _font_file(self):
+        data = self.font.subset(sorted(self.used_glyphs))
+        return self._stream_object(
+            FONT_FILE_ID, zlib.compress(data),
+            f' /Length1 {len(data)} /Filter /FlateDecode'
+        )
+
+    def finish(self):
+        """Отдает последнюю страницу, подмножество шрифта с
+        использованными глифами и таблицу ссылок.
+        """
+        if self.lines or not self.page_ids:
+            yield self._page()
+        font = self.font
+        widths = ' '.join(
+            f'{glyph} [{font.width(glyph)}]'
+            for glyph in sorted(self.used_glyphs)
+        )
+        # Префикс имени обозначает подмножество шрифта.
+        base_font = f'FGRMSL+{font.name}'
+        yield self._object(FONT_ID, (
+            f'<< /Type /Font /Subtype /Type0 /BaseFont /{base_font} '
+            f'/Encoding /Identity-H /DescendantFonts [{CID_FONT_ID} 0 R] '
+            f'/ToUnicode {TO_UNICODE_ID} 0 R >>'
+        ).encode())
+        yield self._object(CID_FONT_ID, (
+            f'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{base_font} '
+            '/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) '
+            f'/Supplement 0 >> /FontDescriptor {FONT_DESCRIPTOR_ID} 0 R '
+            f'/W [{widths}] /CIDToGIDMap /Identity >>'
+        ).encode())
+        yield self._object(FONT_DESCRIPTOR_ID, (
+            f'<< /Type /FontDescriptor /FontName /{base_font} /Flags 32 '
+            f'/FontBBox [{" ".join(map(str, font.bbox))}] /ItalicAngle 0 '
+            f'/Ascent {font.ascent} /Descent {font.descent} '
+            f'/CapHeight {font.ascent} /StemV 80 '
+            f'/FontFile2 {FONT_FILE_ID} 0 R >>'
+        ).encode())
+        yield self._font_file()
+        yield self._stream_object(TO_UNICODE_ID, self._to_unicode())
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self.page_ids)
+        yield self._object(PAGES_ID, (
+            f'<< /Type /Pages /Kids [{kids}] '
+            f'/Count {len(self.page_ids)} >>'
+        ).encode())
+        yield self._object(
+            CATALOG_ID, f'<< /Type /Catalog /Pages {PAGES_ID} 0 R >>'.encode()
+        )
+        xref_position = self.position
+        xref = [f'xref\n0 {self.next_id}\n', '0000000000 65535 f \n']
+        xref.extend(
+            f'{self.offsets[object_id]:010d} 00000 n \n'
+            for object_id in range(1, self.next_id)
+        )
+        yield self._write(''.join(xref).encode())
+        yield self._write((
+            f'trailer\n<< /Size {self.next_id} /Root {CATALOG_ID} 0 R >>\n'
+            f'startxref\n{xref_position}\n%%EOF\n'
+        ).encode())
+
+    def stream(self, lines):
+        """Потоково отдает документ из строк lines."""
+        yield self.start()
+        for line in lines:
+            yield from self.add_line(line)
+        yield from self.finish()
@@ -0,0 +1,105 @@
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from heapq import nsmallest
+
+from django.conf import settings
+
+from recipes.cache import get_model_version
+from recipes.models import RecipeIngredient
+
+INDEX_CHUNK_SIZE = 10000
+
+
+class CookableRecipes:
+    """Рецепты, в которых есть хотя бы один из имеющихся ингредиентов,
+    упорядоченные по доле имеющихся ингредиентов, затем по числу
+    недостающих и от новых к старым.
+
+    Поддерживает len() и срезы, поэтому передается в пагинатор:
+    ранжируются только рецепты до конца запрошенной страницы.
+    Элементы - кортежи (id рецепта, доля, число недостающих).
+    """
+    def __init__(self, matches, sizes):
+        self.matches = matches
+        self.sizes = sizes
+
+    def __len__(self):
+        return len(self.matches)
+
+    def _key(self, item):
+        recipe_id, matched = item
+        size = self.sizes[recipe_id]
+        return -matched / size, size - matched, -recipe_id
+
+    def __getitem__(self, page):
+        ranked = nsmallest(page.stop, self.matches.items(), key=self._key)
+        return [
+            (
+                recipe_id, matched / self.sizes[recipe_id],
+                self.sizes[recipe_id] - matched
+            )
+            for recipe_id, matched in ranked[page.start:]
+        ]
+
+
+class RecipeIngredientIndex:
+    """Обратный индекс ингредиентов рецептов в памяти процесса.
+
+    Для каждого ингредиента хранит массив id рецептов, в которые он
+    входит, а для каждого рецепта - число его ингредиентов. Индекс
+    перестраивается, когда меняется версия модели RecipeIngredient
+    в общем кеше, но не чаще раза в RECIPE_INDEX_REFRESH_INTERVAL
+    секунд. Пока один поток перестраивает индекс, остальные
+    пользуются прежним.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = None
+        self._postings = {}
+        self._sizes = {}
+
+    def _refresh(self):
+        now = time.monotonic()
+        if (
+            self._version is not None
+            and now - self._checked_at < settings.RECIPE_INDEX_REFRESH_INTERVAL
+        ):
+            return
+        self._checked_at = now
+        version = get_model_version(RecipeIngredient)
+        if version == self._version:
+            return
+        if not self._lock.acquire(blocking=self._version is None):
+            return
+        try:
+            if version == self._version:
+                return
+            postings = defaultdict(lambda: array('q'))
+            sizes = Counter()
+            for recipe_id, ingredient_id in RecipeIngredient.objects.order_by(
+            ).values_list('recipe_id', 'ingredient_id').iterator(
+                chunk_size=INDEX_CHUNK_SIZE
+            ):
+                postings[ingredient_id].append(recipe_id)
+                sizes[recipe_id] += 1
+            self._postings, self._sizes = dict(postings), sizes
+            self._version = version
+        finally:
+            self._lock.release()
+
+    def cookable(self, ingredient_ids):
+        """Возвращает рецепты, отсортированные по покрытию
+        ингредиентами ingredient_ids.
+        """
+        self._refresh()
+        postings, sizes = self._postings, self._sizes
+        matches = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matches.update(postings.get(ingredient_id, ()))
+        return CookableRecipes(matches, sizes)
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
@@ -1,18 +1,20 @@
-import base64
-
 from django.conf import settings
-from django.core.files.base import ContentFile
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from api.messages import (COOKING_TIME_ERR, INGRED_AMOUNT_ERR,
-                          INGRED_NOT_FOUND_ERR, INGRED_REPEAT_ERR,
+                          INGRED_DOES_NOT_EXIST_ERR, INGRED_NOT_FOUND_ERR,
+                          INGRED_REPEAT_ERR, TAG_DOES_NOT_EXIST_ERR,
                           TAG_NOT_FOUND_ERR, TAG_REPEAT_ERR)
-from api.utils import add_ingredients_for_recipe
+from api.utils import (add_ingredients_for_recipe, decode_base64_image,
+                       get_recipes_limit, update_ingredients_for_recipe)
+from recipes.images import variants_are_current
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag, User)
+                            RecipeIngredient, ShoppingCart,
+                            ShoppingCartIngredient, Tag, User)
 
 
 class UsersSerializer(UserSerializer):
@@ -30,6 +32,8 @@ class UsersSerializer(UserSerializer):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(object, 'is_subscribed'):
+            return object.is_subscribed
         return object.subscribed.filter(user=user).exists()
 
 
@@ -46,15 +50,43 @@ class UsersCreateSerializer(UserCreateSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
-    """Сериализатор для декодирования изображения base64 для модели Recipe."""
+    """Сериализатор для декодирования изображения base64 для модели Recipe.
+    Картинка уже проверена при декодировании, поэтому повторная проверка
+    ImageField с чтением файла в память не выполняется.
+    """
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            return serializers.FileField.to_internal_value(
+                self, decode_base64_image(data)
+            )
         return super().to_internal_value(data)
 
 
+class ImageVariantsField(serializers.Field):
+    """Ссылки на уменьшенные копии картинки рецепта. Пока копии
+    не созданы, вместо них отдается ссылка на исходную картинку.
+    """
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        request = self.context.get('request')
+        is_current = variants_are_current(recipe)
+        variants = {}
+        for variant in settings.RECIPE_IMAGE_VARIANTS:
+            image = (
+                getattr(recipe, f'image_{variant}') if is_current
+                else recipe.image
+            )
+            url = image.url if image else None
+            if url and request:
+                url = request.build_absolute_uri(url)
+            variants[variant] = url
+        return variants
+
+
 class TagSerializer(serializers.ModelSerializer):
     """Сериализатор для модели Tag."""
 
@@ -87,12 +119,31 @@ class ReadRecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class WriteRecipeIngredientSerializer(serializers.ModelSerializer):
-    """Сериализатор для добавления ингредиентов в рецепт."""
+class ShoppingCartIngredientSerializer(serializers.ModelSerializer):
+    """Сериализатор для отображения ингредиентов в корзине."""
     id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(), source='ingredient'
+        source='ingredient.id', read_only=True
+    )
+    name = serializers.CharField(
+        source='ingredient.name', read_only=True
+    )
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit', read_only=True
     )
 
+    class Meta:
+        model = ShoppingCartIngredient
+        fields = ('id', 'name', 'measurement_unit', 'total_amount')
+
+
+class WriteRecipeIngredientSerializer(serializers.ModelSerializer):
+    """Сериализатор для добавления ингредиентов в рецепт. Существование
+    ингредиентов и количество проверяются для всего списка сразу в
+    WriteRecipeSerializer.
+    """
+    id = serializers.IntegerField()
+    amount = serializers.IntegerField()
+
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'amount')
@@ -107,33 +158,55 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date',)
+        exclude = (
+            'pub_date', 'favorites_count', 'in_carts_count',
+            'image_thumbnail', 'image_card', 'image_full', 'search_vector',
+            'similar_outdated'
+        )
 
     def get_is_favorited(self, object):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(object, 'is_favorited'):
+            return object.is_favorited
         return object.favorite.filter(user=user).exists()
 
     def get_is_in_shopping_cart(self, object):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(object, 'is_in_shopping_cart'):
+            return object.is_in_shopping_cart
         return object.shopping_cart.filter(user=user).exists()
 
 
+class CookableRecipeSerializer(ReadRecipeSerializer):
+    """Сериализатор рецепта с долей имеющихся ингредиентов
+    и количеством недостающих.
+    """
+    coverage = serializers.FloatField(read_only=True)
+    missing_count = serializers.IntegerField(read_only=True)
+
+
 class WriteRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для создания объекта рецепта модели Recipe."""
     author = UsersSerializer(read_only=True)
     image = Base64ImageField()
     ingredients = WriteRecipeIngredientSerializer(many=True)
+    tags = serializers.ListField(child=serializers.IntegerField())
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date',)
+        exclude = (
+            'pub_date', 'favorites_count', 'in_carts_count',
+            'image_thumbnail', 'image_card', 'image_full', 'search_vector',
+            'similar_outdated'
+        )
 
     @transaction.atomic
     def create(self, validated_data):
@@ -147,63 +220,96 @@ class WriteRecipeSerializer(serializers.ModelSerializer):
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        instance.name = validated_data.get('name', instance.name)
-        instance.image = validated_data.get('image', instance.image)
-        instance.text = validated_data.get('text', instance.text)
-        instance.cooking_time = validated_data.get(
-            'cooking_time', instance.cooking_time
-        )
-        if 'ingredients' not in validated_data:
-            instance.save()
-            return instance
-        ingredients = validated_data.pop('ingredients')
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        add_ingredients_for_recipe(instance, ingredients)
-        if 'tags' not in validated_data:
-            instance.save()
-            return instance
-        tags = validated_data.pop('tags')
-        instance.tags.set(tags)
-        instance.save()
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        update_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in update_fields:
+            setattr(instance, field, validated_data[field])
+        if update_fields:
+            instance.save(update_fields=update_fields)
+        if ingredients is not None:
+            update_ingredients_for_recipe(instance, ingredients)
+        if tags is not None:
+            instance.tags.set(tags)
         return instance
 
-    def validate(self, data):
-        cooking_time = data.get('cooking_time')
-        ingredients = data.get('ingredients')
-        tags = data.get('tags')
+    def validate_ingredients(self, ingredients):
         if not ingredients:
-            raise ValidationError(INGRED_NOT_FOUND_ERR)
+            raise ValidationError(INGRED_NOT_FOUND_ERR['ingredients'])
+        found = Ingredient.objects.in_bulk(
+            {ingredient['id'] for ingredient in ingredients}
+        )
+        seen = set()
+        errors = []
+        for ingredient in ingredients:
+            ingredient_errors = {}
+            if ingredient['id'] not in found:
+                ingredient_errors['id'] = [
+                    INGRED_DOES_NOT_EXIST_ERR.format(ingredient['id'])
+                ]
+            elif ingredient['id'] in seen:
+                ingredient_errors['id'] = [INGRED_REPEAT_ERR['ingredients']]
+            seen.add(ingredient['id'])
+            if not (settings.INGRED_MIN_AMOUNT <= ingredient['amount']
+                    <= settings.INGRED_MAX_AMOUNT):
+                ingredient_errors['amount'] = [INGRED_AMOUNT_ERR]
+            errors.append(ingredient_errors)
+        if any(errors):
+            raise ValidationError(errors)
+        return [
+            {'ingredient': found[ingredient['id']],
+             'amount': ingredient['amount']}
+            for ingredient in ingredients
+        ]
+
+    def validate_tags(self, tags):
         if not tags:
+            raise ValidationError(TAG_NOT_FOUND_ERR['tags'])
+        found = Tag.objects.in_bulk(set(tags))
+        errors = [
+            TAG_DOES_NOT_EXIST_ERR.format(tag) for tag in tags
+            if tag not in found
+        ]
+        if len(set(tags)) != len(tags):
+            errors.append(TAG_REPEAT_ERR['tags'])
+        if errors:
+            raise ValidationError(errors)
+        return [found[tag] for tag in tags]
+
+    def validate(self, data):
+        if 'ingredients' not in data:
+            raise ValidationError(INGRED_NOT_FOUND_ERR)
+        if 'tags' not in data:
             raise ValidationError(TAG_NOT_FOUND_ERR)
-        ingredients_list = []
-        tags_list = []
-        for i in ingredients:
-            if not (settings.INGRED_MIN_AMOUNT <= i['amount']
-                    <= settings.INGRED_MAX_AMOUNT):
-                raise ValidationError(INGRED_AMOUNT_ERR)
-            if i['ingredient'] in ingredients_list:
-                raise ValidationError(INGRED_REPEAT_ERR)
-            ingredients_list.append(i['ingredient'])
-        for i in tags:
-            if i in tags_list:
-                raise ValidationError(TAG_REPEAT_ERR)
-            tags_list.append(i)
-        if not (settings.COOKING_MIN_TIME <= cooking_time
-                <= settings.COOKING_MAX_TIME):
+        cooking_time = data.get('cooking_time')
+        if cooking_time is not None and not (
+            settings.COOKING_MIN_TIME <= cooking_time
+            <= settings.COOKING_MAX_TIME
+        ):
             raise ValidationError(COOKING_TIME_ERR)
         return data
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            (instance,), 'tags', Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        )
         context = {'request': self.context.get('request')}
         return ReadRecipeSerializer(instance, context=context).data
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для чтения краткой информации о рецепте."""
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
@@ -229,7 +335,7 @@ class FollowUserSerializer(UserSerializer):
     """Сериализатор для подписки или отписки на избранного пользователя."""
     is_subscribed = serializers.SerializerMethodField(read_only=True)
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -243,17 +349,19 @@ class FollowUserSerializer(UserSerializer):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(object, 'is_subscribed'):
+            return object.is_subscribed
         return object.subscribed.filter(user=user).exists()
 
     def get_recipes(self, object):
         request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
-        recipes_list = object.recipes.all()
-        if recipes_limit:
-            recipes_list = recipes_list[:int(recipes_limit)]
+        if hasattr(object, 'recipes_preview'):
+            recipes_list = object.recipes_preview
+        else:
+            recipes_limit = get_recipes_limit(request)
+            recipes_list = object.recipes.all()
+            if recipes_limit:
+                recipes_list = recipes_list[:recipes_limit]
         return ShortRecipeSerializer(
             recipes_list, context={'request': request}, many=True
         ).data
-
-    def get_recipes_count(self, object):
-        return object.recipes.count()
@@ -0,0 +1,100 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes import cache as model_cache
+from recipes.models import Ingredient, Tag
+
+CHECK_INTERVAL = 2
+
+
+@override_settings(MODEL_VERSION_CHECK_INTERVAL=CHECK_INTERVAL)
+class ModelVersionTest(TestCase):
+    """Версии моделей читаются из общего кеша не чаще раза
+    в MODEL_VERSION_CHECK_INTERVAL секунд.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.create(name='картофель', measurement_unit='кг')
+
+    def setUp(self):
+        model_cache._local_versions.clear()
+        self.now = 1000.0
+        patcher = mock.patch('recipes.cache.time.monotonic',
+                             lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def count_cache_reads(self):
+        return mock.patch.object(
+            cache, 'get_or_set', wraps=cache.get_or_set
+        )
+
+    def test_autocomplete_reads_version_once_per_interval(self):
+        client = APIClient()
+        with self.count_cache_reads() as get_or_set:
+            for _ in range(5):
+                response = client.get('/api/ingredients/', {'name': 'карт'})
+                self.assertEqual(len(response.json()), 1)
+            self.assertEqual(get_or_set.call_count, 1)
+            self.now += CHECK_INTERVAL
+            client.get('/api/ingredients/', {'name': 'карт'})
+            self.assertEqual(get_or_set.call_count, 2)
+
+    def test_other_process_change_is_seen_after_interval(self):
+        version = model_cache.get_model_version(Ingredient)
+        # Изменение версии другим процессом видно только в общем кеше.
+        cache.set(
+            model_cache.MODEL_VERSION_KEY.format('recipes.ingredient'),
+            version + 1, timeout=None
+        )
+        self.now += CHECK_INTERVAL - 1
+        self.assertEqual(model_cache.get_model_version(Ingredient), version)
+        self.now += 1
+        self.assertEqual(
+            model_cache.get_model_version(Ingredient), version + 1
+        )
+
+    def test_own_change_is_seen_immediately(self):
+        version = model_cache.get_model_version(Ingredient)
+        model_cache.bump_model_version(Ingredient)
+        self.assertNotEqual(
+            model_cache.get_model_version(Ingredient), version
+        )
+
+
+@override_settings(MODEL_VERSION_CHECK_INTERVAL=CHECK_INTERVAL)
+class ListETagTest(TestCase):
+    """Ответ 304 на список не обращается к общему кешу, пока не истек
+    интервал проверки версии модели.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='завтрак', color='#FFFFFF', slug='breakfast')
+
+    def setUp(self):
+        model_cache._local_versions.clear()
+
+    def test_not_modified_skips_shared_cache(self):
+        client = APIClient()
+        etag = client.get('/api/tags/')['ETag']
+        with mock.patch.object(cache, 'get') as get, mock.patch.object(
+            cache, 'get_or_set'
+        ) as get_or_set:
+            response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        get.assert_not_called()
+        get_or_set.assert_not_called()
+
+    def test_own_change_updates_etag(self):
+        client = APIClient()
+        etag = client.get('/api/tags/')['ETag']
+        model_cache.bump_model_version(Tag)
+        response = client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,141 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipes.models import (Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCartIngredient, Tag, User)
+from recipes.shopping_cart import cart_totals
+
+THREADS = 8
+
+
+class ConcurrentToggleTest(TransactionTestCase):
+    """Одновременные одинаковые запросы добавления и удаления рецепта
+    дают один успешный ответ, остальные - 400, счетчики не расходятся.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username='user', email='user@ya.ru')
+        self.author = author = User.objects.create(
+            username='author', email='author@ya.ru'
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name='recipe', text='text', cooking_time=5
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=self.recipe, amount=i + 1,
+                ingredient=Ingredient.objects.create(
+                    name=f'ingredient{i}', measurement_unit='г'
+                )
+            )
+            for i in range(3)
+        )
+
+    def hammer(self, method, url):
+        """Отправляет THREADS одинаковых запросов одновременно
+        и возвращает коды ответов.
+        """
+        barrier = threading.Barrier(THREADS)
+
+        def request(_):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            barrier.wait()
+            try:
+                return getattr(client, method)(url).status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            return list(pool.map(request, range(THREADS)))
+
+    def assert_one_succeeded(self, statuses, success):
+        self.assertEqual(statuses.count(success), 1, statuses)
+        self.assertEqual(
+            statuses.count(status.HTTP_400_BAD_REQUEST), THREADS - 1, statuses
+        )
+
+    def assert_cart_totals(self):
+        self.assertEqual(
+            set(ShoppingCartIngredient.objects.filter(
+                user=self.user
+            ).values_list('user_id', 'ingredient_id', 'total_amount')),
+            set(cart_totals([self.user.id]))
+        )
+
+    def toggle(self, action, counter, check=lambda: None):
+        url = f'/api/recipes/{self.recipe.id}/{action}/'
+        for method, success, count in (
+            ('post', status.HTTP_201_CREATED, 1),
+            ('delete', status.HTTP_204_NO_CONTENT, 0),
+        ):
+            with self.subTest(method=method):
+                self.assert_one_succeeded(self.hammer(method, url), success)
+                self.recipe.refresh_from_db()
+                self.assertEqual(getattr(self.recipe, counter), count)
+                check()
+
+    def test_favorite(self):
+        self.toggle('favorite', 'favorites_count')
+
+    def test_shopping_cart(self):
+        self.toggle('shopping_cart', 'in_carts_count', self.assert_cart_totals)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_ingredients_update_with_cart_changes(self):
+        """Изменения ингредиентов рецепта и добавления его в корзины
+        выполняются по очереди, суммы в корзинах не расходятся
+        с пересчитанными. В SQLite изменение рецепта, читающее данные
+        до записи, одновременно с другими записями не выполняется.
+        """
+        tag = Tag.objects.create(name='tag', color='#FFFFFF', slug='tag')
+        ingredient_ids = list(RecipeIngredient.objects.filter(
+            recipe=self.recipe
+        ).values_list('ingredient_id', flat=True))
+        users = [
+            User.objects.create(username=f'user{i}', email=f'user{i}@ya.ru')
+            for i in range(THREADS // 2)
+        ]
+        barrier = threading.Barrier(THREADS)
+
+        def request(i):
+            client = APIClient()
+            barrier.wait()
+            try:
+                if i % 2:
+                    client.force_authenticate(users[i // 2])
+                    return client.post(
+                        f'/api/recipes/{self.recipe.id}/shopping_cart/'
+                    ).status_code
+                client.force_authenticate(self.author)
+                return client.patch(
+                    f'/api/recipes/{self.recipe.id}/',
+                    {
+                        'tags': [tag.id],
+                        'ingredients': [
+                            {'id': pk, 'amount': i + j + 1}
+                            for j, pk in enumerate(ingredient_ids[i % 3:])
+                        ],
+                    },
+                    format='json'
+                ).status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(THREADS) as pool:
+            statuses = list(pool.map(request, range(THREADS)))
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED),
+                         THREADS // 2, statuses)
+        self.assertEqual(statuses.count(status.HTTP_200_OK),
+                         THREADS // 2, statuses)
+        self.assertEqual(
+            set(ShoppingCartIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount'
+            )),
+            set(cart_totals())
+        )
@@ -0,0 +1,62 @@
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import FeedRecipe, Recipe, User
+from users.models import Subscription
+
+FANOUT_MAX_FOLLOWERS = 2
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=FANOUT_MAX_FOLLOWERS)
+class FeedTest(TestCase):
+    """Лента подписок при переходе автора от записи рецептов в ленты
+    к добавлению их при чтении и обратно.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author', email='a@ya.ru')
+        cls.readers = [
+            User.objects.create(username=f'reader{i}', email=f'r{i}@ya.ru')
+            for i in range(FANOUT_MAX_FOLLOWERS)
+        ]
+
+    def create_recipe(self, name):
+        return Recipe.objects.create(
+            author=self.author, name=name, text='text', cooking_time=5
+        )
+
+    def get_feed(self, reader):
+        client = APIClient()
+        client.force_authenticate(reader)
+        ids, url = [], '/api/recipes/feed/?limit=2'
+        while url:
+            response = client.get(url)
+            ids += [recipe['id'] for recipe in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_recipes_stay_in_feed_after_unfollow(self):
+        reader = self.readers[0]
+        Subscription.objects.create(user=reader, subscribed=self.author)
+        pushed = self.create_recipe('pushed')
+        Subscription.objects.create(
+            user=self.readers[1], subscribed=self.author
+        )
+        pulled = [self.create_recipe(f'pulled{i}') for i in range(3)]
+        self.author.refresh_from_db()
+        self.assertTrue(self.author.feed_pull)
+        self.assertFalse(FeedRecipe.objects.filter(recipe__in=pulled).exists())
+        expected = [recipe.id for recipe in reversed(pulled)] + [pushed.id]
+        self.assertEqual(self.get_feed(reader), expected)
+        # Подписчиков стало меньше порога, но рецепты не пропадают.
+        Subscription.objects.get(user=self.readers[1]).delete()
+        self.assertEqual(self.get_feed(reader), expected)
+        call_command('backfill_feeds')
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.feed_pull)
+        self.assertEqual(
+            FeedRecipe.objects.filter(user=reader).count(), len(expected)
+        )
+        self.assertEqual(self.get_feed(reader), expected)
@@ -0,0 +1,71 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from recipes.images import generate_image_variants, run_image_task
+from recipes.models import Recipe, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def png(size=(64, 48)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageVariantsTest(TestCase):
+    """Уменьшенные копии картинки рецепта."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        author = User.objects.create(username='author', email='a@ya.ru')
+        self.recipe = Recipe.objects.create(
+            author=author, name='recipe', text='text', cooking_time=5
+        )
+
+    def set_image(self, name, content):
+        self.recipe.image.save(name, content, save=False)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image=self.recipe.image.name
+        )
+
+    def variant_names(self):
+        self.recipe.refresh_from_db()
+        return [
+            self.recipe.image_thumbnail.name, self.recipe.image_card.name,
+            self.recipe.image_full.name
+        ]
+
+    def test_replaced_image_variants_are_deleted(self):
+        self.set_image('first.png', png())
+        generate_image_variants(self.recipe.pk)
+        old = self.variant_names()
+        self.assertTrue(all(map(default_storage.exists, old)))
+        self.set_image('second.png', png())
+        generate_image_variants(self.recipe.pk)
+        new = self.variant_names()
+        self.assertTrue(all(map(default_storage.exists, new)))
+        self.assertFalse(any(map(default_storage.exists, old)))
+
+    def test_task_errors_are_logged(self):
+        self.set_image('broken.png', ContentFile(b'not an image'))
+        # Задача закрывает соединение, которое в тесте держит транзакцию.
+        with self.assertLogs('recipes.images', 'ERROR') as logs, \
+                mock.patch.object(connection, 'close'):
+            run_image_task(self.recipe.pk)
+        self.assertIn(str(self.recipe.pk), logs.output[0])
+        self.assertIn('Traceback', logs.output[0])
+        self.assertEqual(self.variant_names(), ['', '', ''])
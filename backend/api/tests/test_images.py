@@ -0,0 +1,88 @@
+import base64
+import io
+import os
+import tracemalloc
+
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.messages import (IMAGE_DIMENSIONS_ERR, IMAGE_INVALID_ERR,
+                          IMAGE_SIZE_ERR)
+from api.utils import BASE64_CHUNK_SIZE, decode_base64_image
+
+SPOOL_SIZE = 256 * 1024
+# Буфер файла в памяти и его копия при переносе на диск, несколько
+# декодируемых частей и служебные объекты Pillow.
+PEAK_MEMORY_LIMIT = 2 * SPOOL_SIZE + 8 * BASE64_CHUNK_SIZE + 512 * 1024
+
+
+def image_data_url(width, height, noise=False):
+    """data URL картинки PNG; шум не дает PNG сжать картинку."""
+    if noise:
+        image = Image.frombytes('RGB', (width, height),
+                                os.urandom(width * height * 3))
+    else:
+        image = Image.new('RGB', (width, height))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=SPOOL_SIZE)
+class DecodeBase64ImageTest(SimpleTestCase):
+    """Декодирование картинок из data URL с ограничениями
+    размера файла, размеров картинки и пиковой памяти.
+    """
+
+    def assert_rejected(self, data, message):
+        with self.assertRaises(ValidationError) as context:
+            decode_base64_image(data)
+        self.assertEqual(context.exception.detail[0], message)
+
+    def test_decodes_image(self):
+        data = image_data_url(40, 30)
+        with decode_base64_image(data) as file:
+            self.assertEqual(file.name, 'temp.png')
+            self.assertEqual(file.size, len(file.read()))
+            file.seek(0)
+            with Image.open(file) as image:
+                self.assertEqual(image.size, (40, 30))
+
+    def test_peak_memory_is_bounded(self):
+        data = image_data_url(1500, 1500, noise=True)
+        self.assertGreater(len(data), 5 * PEAK_MEMORY_LIMIT)
+        tracemalloc.start()
+        try:
+            with decode_base64_image(data):
+                _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, PEAK_MEMORY_LIMIT)
+
+    @override_settings(RECIPE_IMAGE_MAX_SIZE=1024)
+    def test_rejects_large_file_before_decoding(self):
+        # Тело не является base64: размер проверяется раньше декодирования.
+        self.assert_rejected(
+            'data:image/png;base64,' + '!' * 4096, IMAGE_SIZE_ERR
+        )
+
+    @override_settings(RECIPE_IMAGE_MAX_DIMENSION=100)
+    def test_rejects_large_dimensions_by_header(self):
+        data = image_data_url(200, 10)
+        self.assert_rejected(data, IMAGE_DIMENSIONS_ERR)
+        # Заголовка PNG достаточно: остаток файла не читается.
+        header = data[:data.index(',') + 1 + 96]
+        self.assert_rejected(header, IMAGE_DIMENSIONS_ERR)
+
+    def test_rejects_invalid_data(self):
+        for data in (
+            'data:image/png;base64,!!!!',
+            'data:image/png;base64,' + base64.b64encode(b'text').decode(),
+            'data:image/p/ng;base64,AAAA',
+            'image/png;base64,AAAA',
+        ):
+            with self.subTest(data=data):
+                self.assert_rejected(data, IMAGE_INVALID_ERR)
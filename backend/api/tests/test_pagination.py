@@ -0,0 +1,44 @@
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.messages import CURSOR_SEARCH_ERR
+from recipes.models import Recipe, User
+
+
+class RecipeCursorPaginationTest(TestCase):
+    """Пагинация по курсору не сочетается с ранжированием поиска."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(username='author', email='a@ya.ru')
+        for name in ('суп', 'борщ', 'суп гороховый'):
+            Recipe.objects.create(
+                author=author, name=name, text='text', cooking_time=5
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_cursor_with_search_is_rejected(self):
+        response = self.client.get(
+            '/api/recipes/', {'pagination': 'cursor', 'search': 'суп'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), CURSOR_SEARCH_ERR)
+
+    def test_search_is_paginated_by_pages(self):
+        response = self.client.get('/api/recipes/', {'search': 'суп'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_cursor_without_search(self):
+        response = self.client.get(
+            '/api/recipes/', {'pagination': 'cursor', 'limit': 2}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
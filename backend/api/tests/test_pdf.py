@@ -0,0 +1,118 @@
+import re
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.messages import SHOPPING_LIST_PDF_FONT_ERR
+from api.pdf import PDFFontError, PDFStreamWriter
+from recipes.models import Ingredient, Recipe, RecipeIngredient, User
+
+# Шрифт встраивается только с использованными глифами.
+PDF_MAX_SIZE = 48 * 1024
+# Строк списка больше, чем помещается на одной странице.
+LONG_LIST_SIZE = 150
+
+
+class ShoppingListPDFTest(TestCase):
+    """Список покупок в формате PDF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='user', email='user@ya.ru')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='recipe', text='text', cooking_time=5
+        )
+        RecipeIngredient.objects.create(
+            recipe=cls.recipe, amount=2,
+            ingredient=Ingredient.objects.create(
+                name='картофель', measurement_unit='кг'
+            )
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_to_cart(self, recipe):
+        self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+
+    def download(self):
+        return self.client.get(
+            '/api/recipes/download_shopping_cart/', {'format': 'pdf'}
+        )
+
+    def assert_valid_pdf(self, content):
+        self.assertTrue(content.startswith(b'%PDF-'))
+        self.assertTrue(content.endswith(b'%%EOF\n'))
+        # Смещения в таблице ссылок указывают на начала объектов.
+        xref_position = int(re.search(rb'startxref\n(\d+)', content)[1])
+        offsets = re.findall(rb'(\d{10}) 00000 n ', content[xref_position:])
+        for object_id, offset in enumerate(offsets, 1):
+            self.assertTrue(content[int(offset):].startswith(
+                f'{object_id} 0 obj'.encode()
+            ))
+
+    def test_font_is_subset(self):
+        self.add_to_cart(self.recipe)
+        response = self.download()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        content = b''.join(response.streaming_content)
+        self.assert_valid_pdf(content)
+        self.assertLess(len(content), PDF_MAX_SIZE)
+
+    def test_long_list_is_streamed_by_pages(self):
+        recipe = Recipe.objects.create(
+            author=self.user, name='long', text='text', cooking_time=5
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, amount=1,
+                ingredient=Ingredient.objects.create(
+                    name=f'ингредиент {i}', measurement_unit='г'
+                )
+            )
+            for i in range(LONG_LIST_SIZE)
+        )
+        self.add_to_cart(recipe)
+        response = self.download()
+        self.assertTrue(response.streaming)
+        chunks = list(response.streaming_content)
+        pages = [chunk for chunk in chunks if b'/Type /Page ' in chunk]
+        self.assertGreater(len(pages), 1)
+        # Страницы отдаются отдельными частями до шрифта.
+        self.assertTrue(all(b'/FontFile2' not in page for page in pages))
+        self.assert_valid_pdf(b''.join(chunks))
+
+    @override_settings(SHOPPING_LIST_PDF_FONT='/nonexistent/font.ttf')
+    def test_missing_font(self):
+        self.add_to_cart(self.recipe)
+        with self.assertLogs('api.views', 'ERROR') as logs:
+            response = self.download()
+        self.assertEqual(
+            response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+        self.assertFalse(response.streaming)
+        self.assertEqual(response.data, SHOPPING_LIST_PDF_FONT_ERR)
+        self.assertIn('/nonexistent/font.ttf', logs.output[0])
+
+    @override_settings(SHOPPING_LIST_PDF_FONT=__file__)
+    def test_invalid_font(self):
+        self.add_to_cart(self.recipe)
+        with self.assertLogs('api.views', 'ERROR') as logs:
+            response = self.download()
+        self.assertEqual(
+            response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+        self.assertEqual(response.data, SHOPPING_LIST_PDF_FONT_ERR)
+        self.assertIn(
+            f'Не удалось загрузить шрифт {__file__}', logs.output[0]
+        )
+
+    def test_font_is_checked_on_writer_creation(self):
+        with self.assertRaisesMessage(PDFFontError, 'Не удалось загрузить'):
+            PDFStreamWriter(__file__)
+        writer = PDFStreamWriter(settings.SHOPPING_LIST_PDF_FONT)
+        self.assertTrue(next(writer.stream([])).startswith(b'%PDF-'))
@@ -0,0 +1,103 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag, User)
+from users.models import Subscription
+
+RECIPES_COUNT = 12
+PAGE_SIZES = (2, RECIPES_COUNT)
+
+
+@override_settings(PAGINATION_EXACT_COUNT=True)
+class RecipeQueryCountTest(TestCase):
+    """Количество запросов к БД при чтении рецептов не зависит
+    от размера страницы.
+    """
+    # Слаги тегов для фильтра, COUNT, рецепты с авторами, теги,
+    # ингредиенты рецептов.
+    ANONYMOUS_LIST_QUERIES = 5
+    # Флаги избранного и корзины вычисляются в запросе рецептов,
+    # авторы с флагом подписки выбираются отдельным запросом.
+    USER_LIST_QUERIES = 6
+    ANONYMOUS_DETAIL_QUERIES = 4
+    USER_DETAIL_QUERIES = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create(username=f'user{i}', email=f'user{i}@ya.ru')
+            for i in range(3)
+        ]
+        tags = [
+            Tag.objects.create(name=f'tag{i}', color='#FFFFFF', slug=f'tag{i}')
+            for i in range(2)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'ingredient{i}',
+                                      measurement_unit='г')
+            for i in range(5)
+        ]
+        for i in range(RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=cls.users[i % 3], name=f'recipe{i}', text='text',
+                image='recipes/images/image.png', cooking_time=5
+            )
+            recipe.tags.set(tags)
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=j + 1
+                )
+                for j, ingredient in enumerate(ingredients[i % 3:])
+            )
+            FavoriteRecipe.objects.create(user=cls.users[0], recipe=recipe)
+            if i % 2:
+                ShoppingCart.objects.create(user=cls.users[0], recipe=recipe)
+        Subscription.objects.create(user=cls.users[0], subscribed=cls.users[1])
+        cls.recipe = recipe
+
+    def get_client(self, authenticated):
+        client = APIClient()
+        if authenticated:
+            client.force_authenticate(self.users[0])
+        return client
+
+    def assert_list_queries(self, authenticated, queries):
+        client = self.get_client(authenticated)
+        for page_size in PAGE_SIZES:
+            with self.subTest(page_size=page_size):
+                with self.assertNumQueries(queries):
+                    response = client.get(
+                        '/api/recipes/', {'limit': page_size}
+                    )
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def assert_detail_queries(self, authenticated, queries):
+        client = self.get_client(authenticated)
+        with self.assertNumQueries(queries):
+            response = client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.data['id'], self.recipe.id)
+
+    def test_anonymous_list(self):
+        self.assert_list_queries(False, self.ANONYMOUS_LIST_QUERIES)
+
+    def test_authenticated_list(self):
+        self.assert_list_queries(True, self.USER_LIST_QUERIES)
+
+    def test_anonymous_detail(self):
+        self.assert_detail_queries(False, self.ANONYMOUS_DETAIL_QUERIES)
+
+    def test_authenticated_detail(self):
+        self.assert_detail_queries(True, self.USER_DETAIL_QUERIES)
+
+    def test_authenticated_flags(self):
+        response = self.get_client(True).get(
+            '/api/recipes/', {'limit': RECIPES_COUNT}
+        )
+        for recipe in response.data['results']:
+            self.assertTrue(recipe['is_favorited'])
+            self.assertEqual(
+                recipe['author']['is_subscribed'],
+                recipe['author']['id'] == self.users[1].id
+            )
+        self.assertNotIn('search_vector', response.data['results'][0])
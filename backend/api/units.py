@@ -0,0 +1,77 @@
+import json
+from decimal import Decimal
+from functools import lru_cache
+from itertools import groupby
+
+from django.conf import settings
+
+AMOUNT_PRECISION = Decimal('0.01')
+
+
+@lru_cache(maxsize=None)
+def load_unit_conversions():
+    """Загружает таблицу пересчета единиц измерения один раз на процесс.
+
+    Возвращает словари {единица: (базовая единица, множитель)}
+    и {базовая единица: (крупная единица, множитель)}. Целые
+    множители хранятся как int, чтобы пересчет обходился без Decimal.
+    """
+    with open(settings.UNIT_CONVERSIONS_FILE, encoding='utf-8') as file:
+        data = json.load(file)
+    return tuple(
+        {
+            unit: (target, to_number(factor))
+            for unit, (target, factor) in data[key].items()
+        }
+        for key in ('units', 'larger_units')
+    )
+
+
+def to_number(value):
+    value = Decimal(value)
+    if value == value.to_integral_value():
+        return int(value)
+    return value
+
+
+def format_amount(amount):
+    """Количество без лишних нулей после запятой."""
+    if isinstance(amount, int):
+        return str(amount)
+    amount = amount.quantize(AMOUNT_PRECISION)
+    return f'{amount:f}'.rstrip('0').rstrip('.')
+
+
+def normalize_totals(ingredients):
+    """Пересчитывает количества ингредиентов в базовые единицы
+    и складывает строки одного ингредиента с совместимыми единицами.
+
+    Ингредиенты должны быть упорядочены по названию: строки
+    обрабатываются за один проход, в памяти хранится только
+    текущий ингредиент. Большие количества выводятся в крупных
+    единицах, единицы не из таблицы остаются как есть.
+    """
+    units, larger_units = load_unit_conversions()
+    for name, rows in groupby(
+        ingredients, key=lambda row: row['ingredient__name']
+    ):
+        totals = {}
+        for row in rows:
+            unit = row['ingredient__measurement_unit']
+            base_unit, factor = units.get(unit, (unit, 1))
+            totals[base_unit] = (
+                totals.get(base_unit, 0) + row['total_amount'] * factor
+            )
+        for unit, amount in totals.items():
+            larger_unit, factor = larger_units.get(unit, (unit, None))
+            if factor is not None and amount >= factor:
+                unit = larger_unit
+                amount = (
+                    amount // factor if amount % factor == 0
+                    else Decimal(amount) / factor
+                )
+            yield {
+                'ingredient__name': name,
+                'ingredient__measurement_unit': unit,
+                'total_amount': format_amount(amount),
+            }
@@ -1,4 +1,27 @@
+import base64
+import binascii
+import csv
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.messages import (IMAGE_DIMENSIONS_ERR, IMAGE_INVALID_ERR,
+                          IMAGE_SIZE_ERR, RECIPES_LIMIT_ERR)
+from api.pdf import PDFStreamWriter
+from recipes.cache import bump_model_version
 from recipes.models import RecipeIngredient
+from recipes.search import update_search_vectors
+from recipes.shopping_cart import (apply_cart_deltas, carting_users,
+                                   lock_recipes)
+
+BASE64_IMAGE_PREFIX = 'data:image/'
+BASE64_SEPARATOR = ';base64,'
+BASE64_HEADER_MAX_LENGTH = 64
+BASE64_CHUNK_SIZE = 64 * 1024
 
 
 def add_ingredients_for_recipe(recipe_obj, ingredients):
@@ -9,20 +32,159 @@ def add_ingredients_for_recipe(recipe_obj, ingredients):
             ingredient=ingredient['ingredient'],
             amount=ingredient['amount']
         ) for ingredient in ingredients)
+    update_search_vectors((recipe_obj.pk,))
+    transaction.on_commit(lambda: bump_model_version(RecipeIngredient))
+
+
+def update_ingredients_for_recipe(recipe_obj, ingredients):
+    """Обновление списка ингредиентов рецепта: изменяются только
+    отличающиеся количества, добавляются новые и удаляются
+    отсутствующие в списке ингредиенты. Разница количеств
+    применяется к корзинам, в которых лежит рецепт. Рецепт блокируется
+    до чтения ингредиентов, как и при добавлении в корзину и удалении
+    из нее, поэтому разница считается от актуальных количеств и
+    применяется ко всем корзинам с рецептом.
+    """
+    lock_recipes((recipe_obj.pk,))
+    existing = {
+        recipe_ingredient.ingredient_id: recipe_ingredient
+        for recipe_ingredient in RecipeIngredient.objects.filter(
+            recipe=recipe_obj
+        )
+    }
+    amounts = {
+        ingredient['ingredient'].id: ingredient['amount']
+        for ingredient in ingredients
+    }
+    deltas = {
+        ingredient_id: -recipe_ingredient.amount
+        for ingredient_id, recipe_ingredient in existing.items()
+        if ingredient_id not in amounts
+    }
+    removed = [
+        existing[ingredient_id].id for ingredient_id in deltas
+    ]
+    changed, added = [], []
+    for ingredient_id, amount in amounts.items():
+        recipe_ingredient = existing.get(ingredient_id)
+        if recipe_ingredient is None:
+            added.append(RecipeIngredient(
+                recipe=recipe_obj, ingredient_id=ingredient_id, amount=amount
+            ))
+            deltas[ingredient_id] = amount
+        elif recipe_ingredient.amount != amount:
+            deltas[ingredient_id] = amount - recipe_ingredient.amount
+            recipe_ingredient.amount = amount
+            changed.append(recipe_ingredient)
+    if removed:
+        RecipeIngredient.objects.filter(id__in=removed).delete()
+    if changed:
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
+    if added:
+        RecipeIngredient.objects.bulk_create(added)
+        transaction.on_commit(lambda: bump_model_version(RecipeIngredient))
+    if removed or added:
+        update_search_vectors((recipe_obj.pk,))
+    if deltas:
+        apply_cart_deltas(carting_users((recipe_obj.pk,)), deltas)
 
 
-def create_shopping_list(ingredients):
-    """Формирует список ингредиентов к покупке."""
-    message = (
-        'Вас приветствует FOODGRAM!\n'
-        'Вы сформировали список покупок для выбранных вами рецептов\n\n'
+def decode_base64_image(data):
+    """Декодирует картинку из data URL по частям во временный файл,
+    который хранится в памяти, пока не превысит
+    FILE_UPLOAD_MAX_MEMORY_SIZE. Размер файла проверяется до
+    декодирования, а размеры картинки - по заголовку файла.
+    """
+    header_end = data.find(BASE64_SEPARATOR, 0, BASE64_HEADER_MAX_LENGTH)
+    extension = data[len(BASE64_IMAGE_PREFIX):header_end]
+    if header_end == -1 or not extension.isalnum():
+        raise ValidationError(IMAGE_INVALID_ERR)
+    start = header_end + len(BASE64_SEPARATOR)
+    size = (len(data) - start) * 3 // 4 - data.count('=', len(data) - 2)
+    if size > settings.RECIPE_IMAGE_MAX_SIZE:
+        raise ValidationError(IMAGE_SIZE_ERR)
+    file = SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    try:
+        for position in range(start, len(data), BASE64_CHUNK_SIZE):
+            file.write(base64.b64decode(
+                data[position:position + BASE64_CHUNK_SIZE], validate=True
+            ))
+        file.seek(0)
+        with Image.open(file) as image:
+            if max(image.size) > settings.RECIPE_IMAGE_MAX_DIMENSION:
+                raise ValidationError(IMAGE_DIMENSIONS_ERR)
+            image.verify()
+    except ValidationError:
+        file.close()
+        raise
+    except (binascii.Error, OSError, ValueError, Image.DecompressionBombError):
+        file.close()
+        raise ValidationError(IMAGE_INVALID_ERR)
+    file.seek(0)
+    return UploadedFile(
+        file, name=f'temp.{extension}',
+        content_type=f'image/{extension}', size=size
     )
+
+
+def get_recipes_limit(request):
+    """Возвращает значение параметра recipes_limit из запроса."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if not recipes_limit:
+        return None
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        raise ValidationError(RECIPES_LIMIT_ERR)
+    if recipes_limit < 1:
+        raise ValidationError(RECIPES_LIMIT_ERR)
+    return recipes_limit
+
+
+def shopping_list_lines(ingredients):
+    """Построчно формирует список ингредиентов к покупке."""
+    yield 'Вас приветствует FOODGRAM!'
+    yield 'Вы сформировали список покупок для выбранных вами рецептов'
+    yield ''
     for ingredient in ingredients:
-        message += (
+        yield (
             f' - {ingredient["ingredient__name"]} '
             f'--- {ingredient["total_amount"]}'
-            f' {ingredient["ingredient__measurement_unit"]}\n'
+            f' {ingredient["ingredient__measurement_unit"]}'
         )
-    message += '\nВаш продуктовый помощник FOODGRAM'
+    yield ''
+    yield 'Ваш продуктовый помощник FOODGRAM'
+
+
+def stream_shopping_list_txt(ingredients):
+    """Потоково отдает список покупок в виде текста."""
+    for line in shopping_list_lines(ingredients):
+        yield f'{line}\n'
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку вместо ее хранения."""
+    def write(self, value):
+        return value
+
+
+def stream_shopping_list_csv(ingredients):
+    """Потоково отдает список покупок в формате CSV."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['total_amount'],
+            ingredient['ingredient__measurement_unit']
+        ))
+
 
-    return message
+def stream_shopping_list_pdf(ingredients):
+    """Потоково отдает список покупок в формате PDF. Шрифт загружается
+    при вызове, поэтому ошибка PDFFontError возникает до начала ответа.
+    """
+    writer = PDFStreamWriter(settings.SHOPPING_LIST_PDF_FONT)
+    return writer.stream(shopping_list_lines(ingredients))
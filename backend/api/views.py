@@ -1,31 +1,56 @@
-from django.db.models import Sum
+import logging
+
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch, Q,
+                              Subquery, Sum, Value)
 from django.conf import settings
-from django.http import HttpResponse
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from api.bulk import (ALREADY_ADDED, NOT_FOUND, REMOVED, add_recipes,
+                      bulk_results, get_bulk_ids, remove_recipes,
+                      subscribe_users, unsubscribe_users)
+from api.cache import cache_list_response
 from api.filters import IngredientFilter, RecipeFilter
-from api.messages import (RECIPE_ALR_ADDED_ERR, RECIPE_NOT_ADDED_ERR,
+from api.ingredient_index import ingredient_index
+from api.messages import (COOKABLE_INGREDIENTS_ERR, RECIPE_ALR_ADDED_ERR,
+                          RECIPE_NOT_ADDED_ERR, SHOPPING_LIST_PDF_FONT_ERR,
                           SUBSCR_ALR_ERR, SUBSCR_NOT_FOUND_ERR,
                           SUBSCR_NOT_YOURSELF_ERR)
-from api.paginators import LimitPagination
+from api.paginators import FeedPagination, LimitPagination, RecipePagination
+from api.pdf import PDFFontError
 from api.permissions import (IsAuthorOrAdminOrJustReadingRecipe,
                              IsUserOrAdminOrJustReadingUserdata)
-from api.serializers import (FavoriteRecipeSerializer, FollowUserSerializer,
-                             IngredientSerializer, ShoppingCartSerializer,
-                             TagSerializer, UsersSerializer,
-                             WriteRecipeSerializer)
-from api.utils import create_shopping_list
+from api.recipe_index import recipe_ingredient_index
+from api.serializers import (CookableRecipeSerializer,
+                             FavoriteRecipeSerializer, FollowUserSerializer,
+                             IngredientSerializer, ReadRecipeSerializer,
+                             ShoppingCartIngredientSerializer,
+                             ShoppingCartSerializer, TagSerializer,
+                             UsersSerializer, WriteRecipeSerializer)
+from api.renderers import (ShoppingListCSVRenderer, ShoppingListPDFRenderer,
+                           ShoppingListTextRenderer)
+from api.units import normalize_totals
+from api.utils import (get_recipes_limit, stream_shopping_list_csv,
+                       stream_shopping_list_pdf, stream_shopping_list_txt)
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
-                            RecipeIngredient, ShoppingCart, Tag, User)
+                            RecipeIngredient, ShoppingCart,
+                            ShoppingCartIngredient, Tag, User)
 from users.models import Subscription
 
-SHOPPING_LIST_CONTENT_TYPE = 'text/plain'
+logger = logging.getLogger(__name__)
+
+SHOPPING_LIST_STREAMS = {
+    'txt': stream_shopping_list_txt,
+    'csv': stream_shopping_list_csv,
+    'pdf': stream_shopping_list_pdf,
+}
 
 
 class UsersViewSet(UserViewSet):
@@ -35,6 +60,7 @@ class UsersViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = UsersSerializer
     permission_classes = (AllowAny,)
+    lookup_value_regex = r'\d+'
     pagination_class = LimitPagination
 
     def get_permissions(self):
@@ -51,7 +77,19 @@ class UsersViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        subscriptions = User.objects.filter(subscribed__user=user)
+        recipes_limit = get_recipes_limit(request)
+        recipes = Recipe.objects.defer('search_vector')
+        if recipes_limit:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).order_by('-pub_date').values('pk')[:recipes_limit]
+            ))
+        subscriptions = User.objects.filter(subscribed__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='recipes_preview')
+        )
         page = self.paginate_queryset(subscriptions)
         if page is not None:
             serializer = FollowUserSerializer(
@@ -72,33 +110,52 @@ class UsersViewSet(UserViewSet):
     )
     def subscribe(self, request, id):
         user = request.user
-        subscribed = get_object_or_404(User, id=id)
-        subscription = Subscription.objects.filter(
-            user=user, subscribed=subscribed)
+        id = int(id)
 
         if request.method == 'POST':
-            if subscription.exists():
+            get_recipes_limit(request)
+            if id == user.id:
                 return Response(
-                    SUBSCR_ALR_ERR, status=status.HTTP_400_BAD_REQUEST
+                    SUBSCR_NOT_YOURSELF_ERR, status=status.HTTP_400_BAD_REQUEST
                 )
-            if user == subscribed:
+            result = subscribe_users(user, (id,))[id]
+            if result == NOT_FOUND:
+                raise Http404
+            if result == ALREADY_ADDED:
                 return Response(
-                    SUBSCR_NOT_YOURSELF_ERR, status=status.HTTP_400_BAD_REQUEST
+                    SUBSCR_ALR_ERR, status=status.HTTP_400_BAD_REQUEST
                 )
             serializer = FollowUserSerializer(
-                subscribed, context={'request': request}
+                get_object_or_404(User, id=id), context={'request': request}
             )
-            Subscription.objects.create(user=user, subscribed=subscribed)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            if subscription.exists():
-                subscription.delete()
+            if unsubscribe_users(user, (id,))[id] == REMOVED:
                 return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(User, id=id)
             return Response(
                 SUBSCR_NOT_FOUND_ERR, status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(
+        detail=False,
+        methods=('POST', 'DELETE'),
+        permission_classes=(IsAuthenticated,),
+        url_path='subscribe',
+        url_name='bulk-subscribe'
+    )
+    def bulk_subscribe(self, request):
+        """Подписка на авторов из списка users или отписка от них
+        одним запросом с результатом для каждого автора.
+        """
+        ids = get_bulk_ids(request, 'users')
+        if request.method == 'POST':
+            statuses = subscribe_users(request.user, ids)
+        else:
+            statuses = unsubscribe_users(request.user, ids)
+        return Response(bulk_results(ids, statuses))
+
 
 class TagViewSet(viewsets.ModelViewSet):
     """ViewSet для модели Tag. Выводит список тегов при GET-запросе."""
@@ -108,10 +165,15 @@ class TagViewSet(viewsets.ModelViewSet):
     http_method_names = ('get',)
     pagination_class = None
 
+    @cache_list_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class IngredientViewSet(viewsets.ModelViewSet):
     """ViewSet для модели Ingredient. Выводит список ингредиентов при
     GET-запросе. Поддерживается фильтрация по названию ингредиента.
+    Список отдается из индекса в памяти процесса без обращения к БД.
     """
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -121,36 +183,82 @@ class IngredientViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    @cache_list_response
+    def list(self, request, *args, **kwargs):
+        filterset = self.filterset_class(
+            request.query_params, queryset=self.queryset, request=request
+        )
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        params = filterset.form.cleaned_data
+        limit = params.get('limit')
+        ingredients = ingredient_index.search(
+            params.get('name'), int(limit) if limit else None
+        )
+        serializer = self.get_serializer(ingredients, many=True)
+        return Response(serializer.data)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """ViewSet для модели Recipe. Присутствуют эндпоинты для добавления рецепта
     в избранное или в корзину а также для создания списка для покупок.
     """
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.defer('search_vector')
+    lookup_value_regex = r'\d+'
     serializer_class = WriteRecipeSerializer
     permission_classes = (IsAuthorOrAdminOrJustReadingRecipe,)
-    pagination_class = LimitPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        queryset = super().get_queryset().prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.all()),
+            Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        )
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.select_related('author')
+        return queryset.prefetch_related(
+            Prefetch('author', queryset=User.objects.annotate(
+                is_subscribed=Exists(Subscription.objects.filter(
+                    user=user, subscribed=OuterRef('pk')
+                ))
+            ))
+        ).annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            ))
+        )
+
     def favorite_shopping_cart_handler(self, request, pk, model, serializer):
         user = request.user
-        recipe = get_object_or_404(Recipe, id=pk)
-        object = model.objects.filter(user=user, recipe=recipe)
+        pk = int(pk)
 
         if request.method == 'POST':
-            if object.exists():
+            result = add_recipes(model, user, (pk,))[pk]
+            if result == NOT_FOUND:
+                raise Http404
+            if result == ALREADY_ADDED:
                 return Response(
                     RECIPE_ALR_ADDED_ERR, status=status.HTTP_400_BAD_REQUEST
                 )
-            serializer = serializer(recipe, context={'request': request})
-            model.objects.create(user=user, recipe=recipe)
+            serializer = serializer(
+                get_object_or_404(Recipe, id=pk),
+                context={'request': request}
+            )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            if object.exists():
-                object.delete()
+            if remove_recipes(model, user, (pk,))[pk] == REMOVED:
                 return Response(status=status.HTTP_204_NO_CONTENT)
+            get_object_or_404(Recipe, id=pk)
             return Response(
                 RECIPE_NOT_ADDED_ERR, status=status.HTTP_400_BAD_REQUEST
             )
@@ -175,24 +283,175 @@ class RecipeViewSet(viewsets.ModelViewSet):
             request, pk, ShoppingCart, ShoppingCartSerializer
         )
 
-    @action(detail=False)
+    def bulk_favorite_shopping_cart_handler(self, request, model):
+        """Добавление рецептов из списка recipes или их удаление одним
+        запросом с результатом для каждого рецепта.
+        """
+        ids = get_bulk_ids(request, 'recipes')
+        if request.method == 'POST':
+            statuses = add_recipes(model, request.user, ids)
+        else:
+            statuses = remove_recipes(model, request.user, ids)
+        return Response(bulk_results(ids, statuses))
+
+    @action(
+        detail=False,
+        methods=('POST', 'DELETE'),
+        permission_classes=(IsAuthenticated,),
+        url_path='favorite',
+        url_name='bulk-favorite'
+    )
+    def bulk_favorite(self, request):
+        return self.bulk_favorite_shopping_cart_handler(
+            request, FavoriteRecipe
+        )
+
+    @action(
+        detail=False,
+        methods=('POST', 'DELETE'),
+        permission_classes=(IsAuthenticated,),
+        url_path='shopping_cart',
+        url_name='bulk-shopping-cart'
+    )
+    def bulk_shopping_cart(self, request):
+        return self.bulk_favorite_shopping_cart_handler(
+            request, ShoppingCart
+        )
+
+    @action(detail=True, permission_classes=(AllowAny,))
+    def similar(self, request, pk):
+        """Рецепты, которые чаще всего добавляют в избранное и корзину
+        вместе с данным, из таблицы похожих рецептов.
+        """
+        get_object_or_404(Recipe.objects.only('pk'), pk=pk)
+        recipes = self.get_queryset().filter(
+            similar_to__recipe_id=pk
+        ).order_by('-similar_to__score')
+        serializer = ReadRecipeSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        return Response(serializer.data)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def recommended(self, request):
+        """Рецепты, похожие на избранное и корзину пользователя,
+        по сумме сходства с ними. Рецепты, которые пользователь уже
+        добавил, исключаются.
+        """
+        user = request.user
+        added = Recipe.objects.filter(
+            Q(favorite__user=user) | Q(shopping_cart__user=user)
+        ).values('pk')
+        recipes = self.get_queryset().filter(
+            similar_to__recipe__in=added
+        ).exclude(pk__in=added).annotate(
+            recommendation_score=Sum('similar_to__score')
+        ).order_by('-recommendation_score', '-pub_date', '-id')
+        paginator = LimitPagination()
+        page = paginator.paginate_queryset(recipes, request, self)
+        serializer = ReadRecipeSerializer(
+            page, many=True, context={'request': request}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь,
+        от новых к старым.
+        """
+        page = self.paginate_queryset(self.get_queryset())
+        serializer = ReadRecipeSerializer(
+            page, many=True, context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, permission_classes=(AllowAny,))
+    def cookable(self, request):
+        """Рецепты, которые можно приготовить из ингредиентов с id из
+        параметра ingredients: сначала с наибольшей долей имеющихся
+        ингредиентов, затем с наименьшим числом недостающих.
+        """
+        try:
+            ingredient_ids = {
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',')
+            }
+        except ValueError:
+            raise ValidationError(COOKABLE_INGREDIENTS_ERR)
+        if not ingredient_ids:
+            raise ValidationError(COOKABLE_INGREDIENTS_ERR)
+        paginator = LimitPagination()
+        page = paginator.paginate_queryset(
+            recipe_ingredient_index.cookable(ingredient_ids), request, self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        results = []
+        for recipe_id, coverage, missing_count in page:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage, recipe.missing_count = coverage, missing_count
+            results.append(recipe)
+        serializer = CookableRecipeSerializer(
+            results, many=True, context={'request': request}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def shopping_cart_summary(self, request):
+        """Суммарные количества ингредиентов в корзине пользователя."""
+        ingredients = ShoppingCartIngredient.objects.filter(
+            user=request.user
+        ).select_related('ingredient').order_by(
+            'ingredient__name', 'ingredient__measurement_unit'
+        )
+        serializer = ShoppingCartIngredientSerializer(ingredients, many=True)
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListPDFRenderer
+        )
+    )
     def download_shopping_cart(self, request):
         user = request.user
         if not user.shopping_cart.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
-        queryset = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values('ingredient__name', 'ingredient__measurement_unit').order_by(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(total_amount=Sum('amount'))
-
-        shopping_list = create_shopping_list(queryset)
+        queryset = ShoppingCartIngredient.objects.filter(
+            user=request.user
+        ).values(
+            'ingredient__name', 'ingredient__measurement_unit', 'total_amount'
+        ).order_by('ingredient__name', 'ingredient__measurement_unit')
 
-        response = HttpResponse(
-            shopping_list, content_type=SHOPPING_LIST_CONTENT_TYPE
-        )
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        try:
+            content = SHOPPING_LIST_STREAMS[renderer.format](
+                normalize_totals(queryset.iterator())
+            )
+        except PDFFontError as error:
+            logger.error('Список покупок в PDF не сформирован: %s', error)
+            return Response(
+                SHOPPING_LIST_PDF_FONT_ERR,
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        response = StreamingHttpResponse(content, content_type=content_type)
         response['Content-Disposition'] = (
-            f'attachment; filename={settings.SHOPPING_LIST_FILE_NAME}'
+            'attachment; '
+            f'filename={settings.SHOPPING_LIST_FILE_NAME}.{renderer.format}'
         )
         return response
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -76,6 +77,30 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# Кеш должен быть общим для всех процессов: версии данных, по которым
+# сбрасываются индексы и закешированные ответы, меняют и команды
+# загрузки данных, запущенные отдельным процессом
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION') or os.path.join(
+            tempfile.gettempdir(), 'foodgram_cache'
+        ),
+    }
+}
+# Время хранения закешированных ответов API в секундах
+API_CACHE_TIMEOUT = 60 * 60
+# Процесс перечитывает версии данных моделей из общего кеша не чаще
+# раза в указанное число секунд: изменения, сделанные другими
+# процессами, индексы и ETag списков видят с такой задержкой
+MODEL_VERSION_CHECK_INTERVAL = 2
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -136,8 +161,57 @@ INGRED_MAX_AMOUNT = 10000
 COOKING_MIN_TIME = 1
 COOKING_MAX_TIME = 600
 
+# Ограничения для загружаемой картинки рецепта: размер в байтах
+# и наибольшая сторона в пикселях
+RECIPE_IMAGE_MAX_SIZE = 20 * 1024 * 1024
+RECIPE_IMAGE_MAX_DIMENSION = 8000
+
+# Уменьшенные копии картинки рецепта: наибольшая сторона в пикселях
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1280,
+}
+RECIPE_IMAGE_VARIANTS_DIR = 'recipes/images/variants/'
+RECIPE_IMAGE_VARIANTS_QUALITY = 80
+# Копии создаются в фоновых потоках процесса, либо сразу при сохранении
+RECIPE_IMAGE_VARIANTS_ASYNC = True
+RECIPE_IMAGE_VARIANTS_WORKERS = 2
+
+# Таблица пересчета единиц измерения для списка покупок
+UNIT_CONVERSIONS_FILE = BASE_DIR / 'data' / 'units.json'
+
 # Имя для файла со списком покупок
 SHOPPING_LIST_FILE_NAME = 'shopping_list'
+# TrueType-шрифт с кириллицей для списка покупок в формате PDF
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# Обратный индекс ингредиентов рецептов для подбора рецептов по
+# имеющимся продуктам проверяет актуальность не чаще раза в указанное
+# число секунд
+RECIPE_INDEX_REFRESH_INTERVAL = 10
+
+# Количество похожих рецептов, сохраняемых для каждого рецепта
+RECIPE_SIMILAR_TOP_K = 10
+
+# Автор, у которого при публикации рецепта не меньше указанного числа
+# подписчиков, помечается флагом feed_pull: его рецепты не записываются
+# в ленты подписчиков, а добавляются при чтении ленты. Флаг снимает
+# только команда backfill_feeds
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+
+# Наибольшее количество id в одном запросе массового добавления
+# в избранное и корзину и массовой подписки
+BULK_ACTION_MAX_ITEMS = 500
+
+# Подсчет общего количества объектов при постраничном выводе: точный,
+# либо закешированный на PAGINATION_COUNT_CACHE_TIMEOUT секунд и
+# оценочный для списков без фильтров длиннее PAGINATION_ESTIMATE_THRESHOLD
+PAGINATION_EXACT_COUNT = os.getenv('PAGINATION_EXACT_COUNT', 'False') == 'True'
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+PAGINATION_ESTIMATE_THRESHOLD = 100000
 
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS':
@@ -1,8 +1,10 @@
 from django import forms
 from django.contrib import admin
 
+from api.paginators import CachedCountPaginator
 from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
                             RecipeIngredient, ShoppingCart, Tag)
+from recipes.shopping_cart import carting_users, rebuild_cart_totals
 
 
 admin.site.empty_value_display = '--пусто--'
@@ -38,6 +40,7 @@ class IngredientsFormsSet(forms.models.BaseInlineFormSet):
 class IngredientsInline(admin.TabularInline):
     model = RecipeIngredient
     formset = IngredientsFormsSet
+    autocomplete_fields = ('ingredient',)
     min_num = 1
     extra = 2
 
@@ -53,13 +56,25 @@ class RecipeAdmin(admin.ModelAdmin):
               ('tags', 'author'),
               'favorite')
     inlines = (IngredientsInline,)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'author'
+        ).prefetch_related('tags')
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change:
+            rebuild_cart_totals(carting_users((form.instance.pk,)))
 
     def email(self, obj):
         return obj.author.email
     email.short_description = 'Email'
 
     def favorite(self, obj):
-        return obj.favorite.count()
+        return obj.favorites_count
     favorite.short_description = 'Раз добавлено в избранное'
 
     def tag(self, obj):
@@ -72,6 +87,27 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     search_fields = ('recipe__name', 'ingredient__name')
     list_filter = ('recipe__tags__name', 'ingredient__measurement_unit')
     list_display_links = ('ingredient',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'ingredient', 'recipe'
+        ).prefetch_related('recipe__tags')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        recipe_ids = {obj.recipe_id, form.initial.get('recipe')}
+        rebuild_cart_totals(carting_users(recipe_ids - {None}))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        rebuild_cart_totals(carting_users((obj.recipe_id,)))
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        rebuild_cart_totals(carting_users(recipe_ids))
 
     def tags(self, obj):
         return ', '.join([tag.name for tag in obj.recipe.tags.all()])
@@ -82,6 +118,13 @@ class FavoriteRecipeAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'email', 'recipe', 'tags')
     search_fields = ('user__username', 'user__email', 'recipe__name')
     list_filter = ('recipe__tags__name',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'user', 'recipe'
+        ).prefetch_related('recipe__tags')
 
     def email(self, obj):
         return obj.user.email
@@ -0,0 +1,42 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+MODEL_VERSION_KEY = 'model_version:{}'
+
+# Версии моделей, прочитанные процессом из общего кеша, и время чтения.
+_local_versions = {}
+
+
+def get_model_version(model):
+    """Возвращает текущую версию данных модели. Версией служит время
+    последнего изменения в наносекундах.
+
+    Версия читается из общего кеша не чаще раза в
+    MODEL_VERSION_CHECK_INTERVAL секунд, в остальное время берется из
+    памяти процесса. Изменения, сделанные другими процессами, становятся
+    видны не позже чем через этот интервал, изменения текущего
+    процесса - сразу.
+    """
+    key = MODEL_VERSION_KEY.format(model._meta.label_lower)
+    now = time.monotonic()
+    local = _local_versions.get(key)
+    if (
+        local is not None
+        and now - local[1] < settings.MODEL_VERSION_CHECK_INTERVAL
+    ):
+        return local[0]
+    version = cache.get_or_set(key, time.time_ns(), timeout=None)
+    _local_versions[key] = (version, now)
+    return version
+
+
+def bump_model_version(model):
+    """Меняет версию данных модели, сбрасывая зависящие от нее кеши
+    во всех процессах.
+    """
+    key = MODEL_VERSION_KEY.format(model._meta.label_lower)
+    version = time.time_ns()
+    cache.set(key, version, timeout=None)
+    _local_versions[key] = (version, time.monotonic())
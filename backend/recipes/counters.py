@@ -0,0 +1,48 @@
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def update_counter(model, pk, field, delta, **values):
+    """Атомарно изменяет счетчик field объекта model на delta,
+    заодно записывая в объект значения values.
+    """
+    update_counters(model, (pk,), field, delta, **values)
+
+
+def update_counters(model, pks, field, delta, **values):
+    """Атомарно изменяет счетчик field объектов model с ключами pks
+    на delta одним запросом.
+    """
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta}, **values)
+
+
+def count_subquery(model, field):
+    """Подзапрос количества объектов model, ссылающихся через
+    поле field на объект внешнего запроса.
+    """
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def rebuild_counters(apps=global_apps):
+    """Пересчитывает денормализованные счетчики рецептов и пользователей."""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FavoriteRecipe = apps.get_model('recipes', 'FavoriteRecipe')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    User = apps.get_model('users', 'MyUser')
+    Subscription = apps.get_model('users', 'Subscription')
+    Recipe.objects.update(
+        favorites_count=count_subquery(FavoriteRecipe, 'recipe'),
+        in_carts_count=count_subquery(ShoppingCart, 'recipe')
+    )
+    User.objects.update(
+        recipes_count=count_subquery(Recipe, 'author'),
+        followers_count=count_subquery(Subscription, 'subscribed')
+    )
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from heapq import merge
+from itertools import islice
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+BATCH_SIZE = 1000
+
+
+def create_entries(entries, apps=global_apps):
+    """Создает записи лент пакетами, пропуская уже существующие."""
+    FeedRecipe = apps.get_model('recipes', 'FeedRecipe')
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, BATCH_SIZE))
+        if not batch:
+            break
+        FeedRecipe.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def push_recipes(recipes):
+    """Записывает рецепты в ленты подписчиков их авторов.
+
+    Автор, у которого стало не меньше FEED_FANOUT_MAX_FOLLOWERS
+    подписчиков, помечается флагом feed_pull: его рецепты больше
+    не записываются в ленты, а добавляются при чтении вместе с уже
+    записанными. Флаг снимает только команда backfill_feeds, заново
+    записывая рецепты автора в ленты, поэтому отписки не убирают
+    рецепты из лент.
+    """
+    FeedRecipe = global_apps.get_model('recipes', 'FeedRecipe')
+    Subscription = global_apps.get_model('users', 'Subscription')
+    User = global_apps.get_model('users', 'MyUser')
+    by_author = defaultdict(list)
+    for recipe in recipes:
+        by_author[recipe.author_id].append(recipe)
+    User.objects.filter(
+        pk__in=by_author, feed_pull=False,
+        followers_count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS
+    ).update(feed_pull=True)
+    subscriptions = Subscription.objects.filter(
+        subscribed_id__in=by_author, subscribed__feed_pull=False
+    ).values_list('user_id', 'subscribed_id').iterator()
+    create_entries(
+        FeedRecipe(
+            user_id=user_id, recipe_id=recipe.pk, pub_date=recipe.pub_date
+        )
+        for user_id, author_id in subscriptions
+        for recipe in by_author[author_id]
+    )
+
+
+def push_authors(user_id, author_ids):
+    """Записывает в ленту пользователя рецепты авторов author_ids,
+    на которых он подписался.
+    """
+    FeedRecipe = global_apps.get_model('recipes', 'FeedRecipe')
+    Recipe = global_apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.filter(
+        author_id__in=author_ids, author__feed_pull=False
+    ).values_list('pk', 'pub_date').iterator()
+    create_entries(
+        FeedRecipe(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+        for pk, pub_date in recipes
+    )
+
+
+def remove_authors(user_id, author_ids):
+    """Удаляет из ленты пользователя рецепты авторов author_ids,
+    от которых он отписался.
+    """
+    FeedRecipe = global_apps.get_model('recipes', 'FeedRecipe')
+    FeedRecipe.objects.filter(
+        user_id=user_id, recipe__author_id__in=author_ids
+    ).delete()
+
+
+def update_pull_authors(apps=global_apps):
+    """Помечает флагом feed_pull авторов, у которых не меньше
+    FEED_FANOUT_MAX_FOLLOWERS подписчиков, и снимает его с остальных.
+    """
+    User = apps.get_model('users', 'MyUser')
+    authors = User.objects.filter(
+        followers_count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS
+    )
+    authors.filter(feed_pull=False).update(feed_pull=True)
+    User.objects.exclude(pk__in=authors).filter(feed_pull=True).update(
+        feed_pull=False
+    )
+
+
+def rebuild_feeds(apps=global_apps):
+    """Заново выбирает авторов, рецепты которых добавляются в ленты при
+    чтении, и заполняет ленты всех пользователей по подпискам.
+    """
+    FeedRecipe = apps.get_model('recipes', 'FeedRecipe')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    with transaction.atomic():
+        update_pull_authors(apps)
+        FeedRecipe.objects.all().delete()
+        rows = Recipe.objects.filter(author__feed_pull=False).values_list(
+            'author__subscribed__user_id', 'pk', 'pub_date'
+        ).filter(author__subscribed__isnull=False).iterator()
+        create_entries(
+            (
+                FeedRecipe(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+                for user_id, pk, pub_date in rows
+            ),
+            apps
+        )
+
+
+def feed_positions(user, limit, position=None):
+    """Позиции (pub_date, id) первых limit рецептов ленты пользователя
+    после позиции position.
+
+    Записи ленты сливаются с рецептами авторов с флагом feed_pull,
+    на которых подписан пользователь. Оба запроса идут по индексам
+    в порядке ленты и читают не больше limit строк.
+    """
+    FeedRecipe = global_apps.get_model('recipes', 'FeedRecipe')
+    Recipe = global_apps.get_model('recipes', 'Recipe')
+    pushed = FeedRecipe.objects.filter(user=user)
+    pulled = Recipe.objects.filter(
+        author__subscribed__user=user, author__feed_pull=True
+    )
+    if position:
+        pub_date, id = position
+        pushed = pushed.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, recipe_id__lt=id)
+        )
+        pulled = pulled.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=id)
+        )
+    positions = []
+    for position in merge(
+        pushed.order_by('-pub_date', '-recipe_id').values_list(
+            'pub_date', 'recipe_id'
+        )[:limit],
+        pulled.order_by('-pub_date', '-id').values_list(
+            'pub_date', 'id'
+        )[:limit],
+        reverse=True
+    ):
+        # Рецепты, записанные до пометки автора, есть и в ленте.
+        if positions and positions[-1] == position:
+            continue
+        positions.append(position)
+        if len(positions) == limit:
+            break
+    return positions
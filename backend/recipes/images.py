@@ -0,0 +1,123 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, features
+
+from recipes.models import Recipe
+
+VARIANT_FORMAT, VARIANT_EXTENSION = (
+    ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+)
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.RECIPE_IMAGE_VARIANTS_WORKERS,
+    thread_name_prefix='recipe-images'
+)
+
+
+def variant_name(recipe_id, image_name, variant):
+    """Имя файла уменьшенной копии для исходной картинки рецепта."""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return (
+        f'{settings.RECIPE_IMAGE_VARIANTS_DIR}'
+        f'{recipe_id}_{stem}_{variant}.{VARIANT_EXTENSION}'
+    )
+
+
+def variants_are_current(recipe):
+    """Проверяет, что уменьшенные копии сделаны из текущей картинки."""
+    return bool(recipe.image) and all(
+        getattr(recipe, f'image_{variant}').name
+        == variant_name(recipe.pk, recipe.image.name, variant)
+        for variant in settings.RECIPE_IMAGE_VARIANTS
+    )
+
+
+def generate_image_variants(recipe_id):
+    """Создает уменьшенные копии картинки рецепта и сохраняет их,
+    если картинка рецепта не поменялась за время обработки. Копии
+    прежней картинки после этого удаляются, а если картинка успела
+    поменяться - удаляются только что созданные.
+    """
+    fields = [f'image_{variant}' for variant in settings.RECIPE_IMAGE_VARIANTS]
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image', *fields
+    ).first()
+    if recipe is None or not recipe.image:
+        return
+    source_name = recipe.image.name
+    previous = {getattr(recipe, field).name for field in fields}
+    variants = {}
+    with default_storage.open(source_name) as file:
+        with Image.open(file) as image:
+            largest = max(settings.RECIPE_IMAGE_VARIANTS.values())
+            image.draft('RGB', (largest, largest))
+            if VARIANT_FORMAT == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+                has_alpha = (
+                    image.mode in ('LA', 'PA')
+                    or 'transparency' in image.info
+                )
+                image = image.convert(
+                    'RGBA' if has_alpha and VARIANT_FORMAT == 'WEBP'
+                    else 'RGB'
+                )
+            for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+                copy = image.copy()
+                copy.thumbnail((size, size))
+                buffer = BytesIO()
+                copy.save(
+                    buffer, VARIANT_FORMAT,
+                    quality=settings.RECIPE_IMAGE_VARIANTS_QUALITY
+                )
+                name = variant_name(recipe_id, source_name, variant)
+                if default_storage.exists(name):
+                    default_storage.delete(name)
+                variants[f'image_{variant}'] = default_storage.save(
+                    name, ContentFile(buffer.getvalue())
+                )
+    saved = Recipe.objects.filter(
+        pk=recipe_id, image=source_name
+    ).update(**variants)
+    created = set(variants.values())
+    unused = previous - created if saved else created
+    for name in unused:
+        if name:
+            default_storage.delete(name)
+
+
+def run_image_task(recipe_id):
+    """Задача фонового потока: ошибки записываются в лог, соединение
+    с БД закрывается после работы.
+    """
+    try:
+        generate_image_variants(recipe_id)
+    except Exception:
+        logger.exception(
+            'Не удалось создать уменьшенные копии картинки рецепта %s',
+            recipe_id
+        )
+    finally:
+        connection.close()
+
+
+def schedule_image_variants(recipe):
+    """Ставит создание уменьшенных копий в очередь после фиксации
+    транзакции, если текущие копии устарели.
+    """
+    if not recipe.image or variants_are_current(recipe):
+        return
+    recipe_id = recipe.pk
+    if settings.RECIPE_IMAGE_VARIANTS_ASYNC:
+        transaction.on_commit(
+            lambda: executor.submit(run_image_task, recipe_id)
+        )
+    else:
+        transaction.on_commit(lambda: generate_image_variants(recipe_id))
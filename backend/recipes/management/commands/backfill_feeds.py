@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild_feeds
+from recipes.models import FeedRecipe
+
+
+class Command(BaseCommand):
+    """Заново помечает авторов флагом feed_pull по числу подписчиков
+    и заполняет ленты подписок пользователей, например после изменения
+    FEED_FANOUT_MAX_FOLLOWERS или чтобы рецепты авторов, потерявших
+    подписчиков, снова записывались в ленты.
+    """
+    help = 'Заполняет ленты подписок пользователей'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rebuild_feeds()
+        print(
+            f'Записано рецептов в ленты: {FeedRecipe.objects.count()} '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
@@ -0,0 +1,54 @@
+import time
+from collections import deque
+
+from django.core.management.base import BaseCommand
+
+from api.units import load_unit_conversions, normalize_totals
+from api.utils import stream_shopping_list_txt
+
+DEFAULT_ROWS = 100000
+UNITS_PER_INGREDIENT = 3
+
+
+class Command(BaseCommand):
+    """Замеряет формирование списка покупок с пересчетом единиц
+    измерения на синтетической корзине.
+    """
+    help = 'Замеряет формирование большого списка покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=DEFAULT_ROWS,
+            help='Количество строк ингредиентов в корзине'
+        )
+
+    @staticmethod
+    def measure(stream):
+        started = time.perf_counter()
+        deque(stream, maxlen=0)
+        return time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        units = [*load_unit_conversions()[0], 'шт.', 'по вкусу']
+        rows = [
+            {
+                'ingredient__name': f'ингредиент {i // UNITS_PER_INGREDIENT}',
+                'ingredient__measurement_unit': units[i % len(units)],
+                'total_amount': i % 1000 + 1,
+            }
+            for i in range(options['rows'])
+        ]
+        timings = (
+            ('пересчет единиц', normalize_totals(rows)),
+            ('текст без пересчета', stream_shopping_list_txt(rows)),
+            (
+                'текст с пересчетом',
+                stream_shopping_list_txt(normalize_totals(rows))
+            ),
+        )
+        for name, stream in timings:
+            elapsed = self.measure(stream)
+            print(
+                f'{name}: {elapsed * 1000:.1f} мс, '
+                f'{len(rows) / elapsed:.0f} строк/с'
+            )
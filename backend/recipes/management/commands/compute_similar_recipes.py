@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import compute_similar_recipes
+
+
+class Command(BaseCommand):
+    """Пересчитывает похожие рецепты по избранному и корзинам."""
+    help = 'Пересчитывает похожие рецепты по избранному и корзинам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать все рецепты, а не только устаревшие'
+        )
+        parser.add_argument(
+            '--top-k', type=int,
+            help='Сколько похожих рецептов хранить для каждого рецепта'
+        )
+
+    def handle(self, *args, **options):
+        count = compute_similar_recipes(options['full'], options['top_k'])
+        print(f'Похожие рецепты пересчитаны для {count} рецептов')
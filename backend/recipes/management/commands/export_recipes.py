@@ -0,0 +1,116 @@
+import base64
+import json
+import mimetypes
+import sys
+import time
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe, RecipeIngredient
+
+DEFAULT_BATCH_SIZE = 1000
+
+RecipeTag = Recipe.tags.through
+
+
+class Command(BaseCommand):
+    """Выгружает рецепты в файл JSON Lines пакетами.
+
+    Рецепты читаются по возрастанию id пакетами фиксированного
+    размера, теги и ингредиенты пакета загружаются двумя запросами.
+    """
+    help = 'Выгружает рецепты в файл JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file', help='Путь к файлу или "-" для вывода в stdout'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество рецептов, читаемых одним запросом'
+        )
+        parser.add_argument(
+            '--embed-images', action='store_true',
+            help='Встраивать картинки в файл в виде data URL'
+        )
+
+    def handle(self, *args, **options):
+        to_stdout = options['file'] == '-'
+        # При выводе в stdout сообщения о прогрессе пишутся в stderr.
+        log = sys.stderr if to_stdout else sys.stdout
+        file = (
+            sys.stdout if to_stdout
+            else open(options['file'], 'w', encoding='utf-8')
+        )
+        exported, last_id = 0, 0
+        started = time.monotonic()
+        try:
+            while True:
+                recipes = list(Recipe.objects.filter(id__gt=last_id).order_by(
+                    'id'
+                ).values(
+                    'id', 'author__username', 'name', 'text',
+                    'cooking_time', 'pub_date', 'image'
+                )[:options['batch_size']])
+                if not recipes:
+                    break
+                last_id = recipes[-1]['id']
+                file.writelines(
+                    json.dumps(recipe, ensure_ascii=False) + '\n'
+                    for recipe in self.serialize_batch(
+                        recipes, options['embed_images']
+                    )
+                )
+                exported += len(recipes)
+                print(
+                    f'Выгружено {exported} рецептов, '
+                    f'{exported / (time.monotonic() - started):.0f} '
+                    'рецептов/с',
+                    file=log
+                )
+        finally:
+            if not to_stdout:
+                file.close()
+
+    @staticmethod
+    def embed_image(name):
+        content_type = mimetypes.guess_type(name)[0] or 'image/jpeg'
+        with default_storage.open(name) as image:
+            data = base64.b64encode(image.read()).decode()
+        return f'data:{content_type};base64,{data}'
+
+    def serialize_batch(self, recipes, embed_images):
+        ids = [recipe['id'] for recipe in recipes]
+        tags = defaultdict(list)
+        for recipe_id, slug in RecipeTag.objects.filter(
+            recipe_id__in=ids
+        ).values_list('recipe_id', 'tag__slug'):
+            tags[recipe_id].append(slug)
+        ingredients = defaultdict(list)
+        for recipe_id, name, unit, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=ids
+        ).order_by().values_list(
+            'recipe_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            ingredients[recipe_id].append({
+                'name': name, 'measurement_unit': unit, 'amount': amount
+            })
+        for recipe in recipes:
+            yield {
+                'id': recipe['id'],
+                'author': recipe['author__username'],
+                'name': recipe['name'],
+                'text': recipe['text'],
+                'cooking_time': recipe['cooking_time'],
+                'pub_date': recipe['pub_date'].isoformat(),
+                'image': (
+                    self.embed_image(recipe['image'])
+                    if embed_images and recipe['image']
+                    else recipe['image']
+                ),
+                'tags': tags[recipe['id']],
+                'ingredients': ingredients[recipe['id']],
+            }
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_image_variants, variants_are_current
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Создает недостающие уменьшенные копии картинок рецептов."""
+    def handle(self, *args, **kwargs):
+        generated = 0
+        recipes = Recipe.objects.only(
+            'image', 'image_thumbnail', 'image_card', 'image_full'
+        )
+        for recipe in recipes.iterator():
+            if recipe.image and not variants_are_current(recipe):
+                generate_image_variants(recipe.pk)
+                generated += 1
+        print(f'Созданы копии картинок для {generated} рецептов')
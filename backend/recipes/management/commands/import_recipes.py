@@ -0,0 +1,338 @@
+import json
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from api.messages import COOKING_TIME_ERR, INGRED_AMOUNT_ERR
+from api.utils import BASE64_IMAGE_PREFIX, decode_base64_image
+from recipes.cache import bump_model_version
+from recipes.counters import count_subquery
+from recipes.feed import push_recipes
+from recipes.models import (FeedRecipe, Ingredient, Recipe, RecipeIngredient,
+                            Tag, User)
+from recipes.search import update_search_vectors
+from recipes.shopping_cart import carting_users, rebuild_cart_totals
+
+DEFAULT_BATCH_SIZE = 1000
+RECIPE_FIELDS = (
+    'author', 'name', 'text', 'cooking_time', 'pub_date', 'image'
+)
+NAME_MAX_LENGTH = Recipe._meta.get_field('name').max_length
+
+RecipeTag = Recipe.tags.through
+
+
+@contextmanager
+def explicit_pub_date():
+    """Отключает auto_now_add у даты публикации, чтобы при
+    восстановлении рецептов сохранялась дата из файла.
+    """
+    field = Recipe._meta.get_field('pub_date')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    """Загружает рецепты из файла JSON Lines пакетами.
+
+    Каждая строка файла - один рецепт в формате команды export_recipes.
+    Теги задаются слагами, ингредиенты - названием и единицей
+    измерения (недостающие ингредиенты создаются), автор - username.
+    Картинка задается путем в хранилище или data URL.
+    """
+    help = 'Загружает рецепты из файла JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file', help='Путь к файлу или "-" для чтения из stdin'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество рецептов, записываемых одной транзакцией'
+        )
+        parser.add_argument(
+            '--conflicts', choices=('ignore', 'update'), default='ignore',
+            help='Что делать с рецептами, id которых уже есть в БД'
+        )
+
+    def handle(self, *args, **options):
+        self.conflicts = options['conflicts']
+        self.tags = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('id', 'name', 'measurement_unit')
+        }
+        self.created = self.updated = self.existing = self.skipped = 0
+        self.explicit_ids = False
+        self.new_ingredients = False
+        started = time.monotonic()
+        file = (
+            sys.stdin if options['file'] == '-'
+            else open(options['file'], 'r', encoding='utf-8')
+        )
+        with file:
+            lines = enumerate(file, start=1)
+            while True:
+                batch = list(islice(lines, options['batch_size']))
+                if not batch:
+                    break
+                self.import_batch(batch)
+                processed = (
+                    self.created + self.updated + self.existing + self.skipped
+                )
+                print(
+                    f'Обработано {processed} рецептов, '
+                    f'{processed / (time.monotonic() - started):.0f} '
+                    'рецептов/с'
+                )
+        if self.explicit_ids:
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), (Recipe,)
+                ):
+                    cursor.execute(sql)
+        if self.new_ingredients:
+            bump_model_version(Ingredient)
+        if self.created or self.updated:
+            bump_model_version(RecipeIngredient)
+        print(
+            f'Создано рецептов: {self.created}, обновлено: {self.updated}, '
+            f'уже были в БД: {self.existing}, с ошибками: {self.skipped}'
+        )
+        if self.created or self.updated:
+            print(
+                'Уменьшенные копии картинок создаются командой '
+                'generate_image_variants'
+            )
+
+    def skip(self, number, reason):
+        self.skipped += 1
+        print(f'Строка {number}: {reason}', file=sys.stderr)
+
+    def parse_recipe(self, line):
+        """Разбирает и проверяет строку файла с рецептом."""
+        data = json.loads(line)
+        name = data['name']
+        if not isinstance(name, str) or not 0 < len(name) <= NAME_MAX_LENGTH:
+            raise ValueError('Недопустимое название рецепта')
+        cooking_time = int(data['cooking_time'])
+        if not (
+            settings.COOKING_MIN_TIME
+            <= cooking_time <= settings.COOKING_MAX_TIME
+        ):
+            raise ValueError(COOKING_TIME_ERR)
+        pub_date = timezone.now()
+        if data.get('pub_date'):
+            pub_date = parse_datetime(data['pub_date'])
+            if pub_date is None:
+                raise ValueError('Недопустимая дата публикации')
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date)
+        ingredients = {}
+        for item in data['ingredients']:
+            amount = int(item['amount'])
+            if not (
+                settings.INGRED_MIN_AMOUNT
+                <= amount <= settings.INGRED_MAX_AMOUNT
+            ):
+                raise ValueError(INGRED_AMOUNT_ERR)
+            ingredients[
+                (str(item['name']), str(item['measurement_unit']))
+            ] = amount
+        return {
+            'id': int(data['id']) if data.get('id') is not None else None,
+            'author': str(data['author']),
+            'name': name,
+            'text': str(data['text']),
+            'cooking_time': cooking_time,
+            'pub_date': pub_date,
+            'image': str(data['image']),
+            'tags': set(data['tags']),
+            'ingredients': ingredients,
+        }
+
+    def create_missing_ingredients(self, rows):
+        """Создает ингредиенты, которых еще нет в БД, одним запросом."""
+        missing = {
+            key for row in rows for key in row['ingredients']
+            if key not in self.ingredients
+        }
+        if not missing:
+            return
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, measurement_unit=unit)
+                for name, unit in missing
+            ),
+            ignore_conflicts=True
+        )
+        names = {name for name, _ in missing}
+        self.ingredients.update(
+            ((name, unit), pk) for pk, name, unit in
+            Ingredient.objects.filter(name__in=names).values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        self.new_ingredients = True
+
+    def save_image(self, image):
+        """Сохраняет картинку из data URL в хранилище
+        и возвращает ее путь.
+        """
+        if not image.startswith(BASE64_IMAGE_PREFIX):
+            return image
+        file = decode_base64_image(image)
+        with file:
+            return default_storage.save(
+                Recipe._meta.get_field('image').generate_filename(
+                    None, uuid.uuid4().hex + os.path.splitext(file.name)[1]
+                ),
+                file
+            )
+
+    def import_batch(self, batch):
+        rows = []
+        for number, line in batch:
+            if not line.strip():
+                continue
+            try:
+                row = self.parse_recipe(line)
+            except (KeyError, TypeError, ValueError) as error:
+                self.skip(number, f'некорректные данные рецепта ({error})')
+                continue
+            row['number'] = number
+            rows.append(row)
+        authors = User.objects.in_bulk(
+            {row['author'] for row in rows}, field_name='username'
+        )
+        existing = dict(Recipe.objects.filter(
+            pk__in=[row['id'] for row in rows if row['id'] is not None]
+        ).values_list('id', 'author_id'))
+        self.create_missing_ingredients(rows)
+        created, updated, accepted = [], [], []
+        batch_ids = set()
+        for row in rows:
+            if row['id'] is not None:
+                if row['id'] in batch_ids:
+                    self.skip(row['number'], f'повторяется id {row["id"]}')
+                    continue
+                batch_ids.add(row['id'])
+            author = authors.get(row['author'])
+            if author is None:
+                self.skip(row['number'], f'нет пользователя {row["author"]}')
+                continue
+            unknown_tags = row['tags'] - self.tags.keys()
+            if unknown_tags:
+                self.skip(
+                    row['number'],
+                    f'нет тегов {", ".join(map(str, unknown_tags))}'
+                )
+                continue
+            if row['id'] in existing and self.conflicts == 'ignore':
+                self.existing += 1
+                continue
+            try:
+                image = self.save_image(row['image'])
+            except ValidationError as error:
+                self.skip(row['number'], error.detail[0])
+                continue
+            recipe = Recipe(
+                id=row['id'], author=author, name=row['name'],
+                text=row['text'], cooking_time=row['cooking_time'],
+                pub_date=row['pub_date'], image=image
+            )
+            (updated if row['id'] in existing else created).append(recipe)
+            accepted.append((recipe, row))
+        with transaction.atomic(), explicit_pub_date():
+            taken = self.write_recipes(created, updated)
+            for recipe, row in accepted:
+                if recipe.id in taken:
+                    self.skip(
+                        row['number'],
+                        f'рецепт с id {recipe.id} создан во время загрузки'
+                    )
+            created = [recipe for recipe in created if recipe.id not in taken]
+            accepted = [
+                (recipe, row) for recipe, row in accepted
+                if recipe.id not in taken
+            ]
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe_id=recipe.id, tag_id=self.tags[slug])
+                for recipe, row in accepted for slug in row['tags']
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe_id=recipe.id,
+                    ingredient_id=self.ingredients[key], amount=amount
+                )
+                for recipe, row in accepted
+                for key, amount in row['ingredients'].items()
+            )
+            update_search_vectors([recipe.id for recipe, _ in accepted])
+            if updated:
+                rebuild_cart_totals(
+                    carting_users([recipe.id for recipe in updated])
+                )
+                FeedRecipe.objects.filter(recipe__in=updated).delete()
+            push_recipes(recipe for recipe, _ in accepted)
+            User.objects.filter(pk__in={
+                *(recipe.author_id for recipe, _ in accepted),
+                *(existing[recipe.id] for recipe in updated)
+            }).update(recipes_count=count_subquery(Recipe, 'author'))
+        self.created += len(created)
+        self.updated += len(updated)
+
+    def write_recipes(self, created, updated):
+        """Создает и обновляет рецепты пакета, старые теги
+        и ингредиенты обновляемых рецептов удаляются.
+
+        Возвращает id рецептов, которые после проверки пакета успели
+        создать в БД другие процессы: такие рецепты не записываются.
+        """
+        with_id = {recipe.id for recipe in created if recipe.id is not None}
+        taken = set()
+        while True:
+            try:
+                with transaction.atomic():
+                    self.insert_recipes([
+                        recipe for recipe in created if recipe.id not in taken
+                    ])
+                break
+            except IntegrityError:
+                now_taken = set(Recipe.objects.filter(
+                    pk__in=with_id
+                ).values_list('pk', flat=True))
+                if now_taken <= taken:
+                    raise
+                taken |= now_taken
+        if updated:
+            Recipe.objects.bulk_update(updated, RECIPE_FIELDS)
+            RecipeTag.objects.filter(recipe__in=updated).delete()
+            RecipeIngredient.objects.filter(recipe__in=updated).delete()
+        return taken
+
+    def insert_recipes(self, created):
+        with_id = [recipe for recipe in created if recipe.id is not None]
+        without_id = [recipe for recipe in created if recipe.id is None]
+        self.explicit_ids = self.explicit_ids or bool(with_id)
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(with_id + without_id)
+        else:
+            Recipe.objects.bulk_create(with_id)
+            for recipe in without_id:
+                recipe.save(force_insert=True)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    """Пересчитывает счетчики избранного, корзин, рецептов и подписчиков."""
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            rebuild_counters()
+        print('Счетчики пересчитаны')
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import ShoppingCartIngredient
+from recipes.shopping_cart import cart_totals, rebuild_cart_totals
+
+
+class Command(BaseCommand):
+    """Сверяет суммарные количества ингредиентов в корзинах с рецептами
+    и пересчитывает их заново.
+    """
+    help = 'Сверяет и пересчитывает суммы ингредиентов в корзинах'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сверить, не пересчитывая'
+        )
+
+    def handle(self, *args, **options):
+        stored = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount in
+            ShoppingCartIngredient.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount'
+            ).iterator()
+        }
+        expected = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount in
+            cart_totals().iterator()
+        }
+        users = {
+            key[0] for key in stored.keys() | expected.keys()
+            if stored.get(key) != expected.get(key)
+        }
+        print(f'Расхождения в корзинах {len(users)} пользователей')
+        if options['check']:
+            return
+        rebuild_cart_totals()
+        print('Суммы ингредиентов в корзинах пересчитаны')
@@ -1,29 +1,195 @@
+import csv
+import io
 import json
+import time
 
+from django.apps.registry import Apps
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.db.utils import IntegrityError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
 
+from recipes.cache import bump_model_version
 from recipes.models import Ingredient, Tag, User
 
+# Справочники: модель, файл с данными и загружаемые поля.
+DICTIONARIES = (
+    (Tag, 'tags.json', ('name', 'color', 'slug')),
+    (Ingredient, 'ingredients.csv', ('name', 'measurement_unit')),
+)
+BATCH_SIZE = 1000
+BENCHMARK_RUNS = 3
+BENCHMARK_PREFIX = 'benchmark_'
+
 
 class Command(BaseCommand):
-    """Извлекает данные из JSON файлов и наполняет ими БД."""
-    def db_objects_create(self, model, json_file):
-        file = open(
-            f'{settings.BASE_DIR}/data/{json_file}', 'r', encoding='utf-8'
+    """Извлекает данные из файлов JSON и CSV и наполняет ими БД.
+
+    В PostgreSQL справочники загружаются командой COPY FROM STDIN во
+    временную таблицу, откуда переносятся одним INSERT ... ON CONFLICT
+    DO NOTHING. В остальных СУБД используется bulk_create с пропуском
+    уже существующих записей. Пользователи всегда создаются через ORM.
+    """
+    help = 'Загружает теги, ингредиенты и пользователей из папки data'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode', choices=('auto', 'copy', 'orm'), default='auto',
+            help='Способ загрузки справочников, auto - COPY для PostgreSQL'
+        )
+        parser.add_argument(
+            '--benchmark', action='store_true',
+            help='Сравнить скорость COPY и ORM на копиях таблиц справочников'
+        )
+
+    @staticmethod
+    def data_path(json_file):
+        return f'{settings.BASE_DIR}/data/{json_file}'
+
+    def read_rows(self, json_file, fields):
+        """Читает строки справочника из файла CSV или JSON."""
+        with open(
+            self.data_path(json_file), 'r', encoding='utf-8', newline=''
+        ) as file:
+            if json_file.endswith('.csv'):
+                return [tuple(row) for row in csv.reader(file) if row]
+            return [
+                tuple(item[field] for field in fields)
+                for item in json.load(file)
+            ]
+
+    def orm_load(self, model, json_file, fields):
+        """Загружает справочник через bulk_create, пропуская записи,
+        которые нарушают ограничения уникальности.
+        """
+        rows = self.read_rows(json_file, fields)
+        count = model.objects.count()
+        model.objects.bulk_create(
+            (model(**dict(zip(fields, row))) for row in rows),
+            batch_size=BATCH_SIZE, ignore_conflicts=True
         )
-        json_data = file.read()
-        data = json.loads(json_data)
-
-        try:
-            model.objects.bulk_create(
-                model(**item) for item in data)
-            print(f'БД пополнена списком {json_file}')
-        except IntegrityError:
-            print(f'Данные {json_file} уже есть в БД')
-
-    def handle(self, *args, **kwargs):
-        self.db_objects_create(Tag, 'tags.json')
-        self.db_objects_create(Ingredient, 'ingredients.json')
-        self.db_objects_create(User, 'users.json')
+        return model.objects.count() - count
+
+    def copy_load(self, model, json_file, fields):
+        """Загружает справочник командой COPY во временную таблицу
+        и переносит новые записи в таблицу модели.
+        CSV-файл передается в COPY без разбора.
+        """
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(
+            connection.ops.quote_name(model._meta.get_field(field).column)
+            for field in fields
+        )
+        if json_file.endswith('.csv'):
+            data = open(
+                self.data_path(json_file), 'r', encoding='utf-8', newline=''
+            )
+        else:
+            data = io.StringIO()
+            csv.writer(data).writerows(self.read_rows(json_file, fields))
+            data.seek(0)
+        with data, transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE dictionary_staging '
+                f'AS SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            cursor.copy_expert(
+                f'COPY dictionary_staging ({columns}) '
+                'FROM STDIN WITH (FORMAT csv)',
+                data
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT {columns} FROM dictionary_staging '
+                'ON CONFLICT DO NOTHING'
+            )
+            created = cursor.rowcount
+            cursor.execute('DROP TABLE dictionary_staging')
+        return created
+
+    def handle(self, *args, **options):
+        is_postgresql = connection.vendor == 'postgresql'
+        if options['mode'] == 'copy' and not is_postgresql:
+            raise CommandError(
+                'Загрузка через COPY доступна только в PostgreSQL'
+            )
+        if options['benchmark']:
+            return self.benchmark(is_postgresql)
+        load = (
+            self.orm_load
+            if options['mode'] == 'orm' or not is_postgresql
+            else self.copy_load
+        )
+        for model, json_file, fields in DICTIONARIES:
+            created = load(model, json_file, fields)
+            if created:
+                bump_model_version(model)
+            print(f'БД пополнена списком {json_file}: {created} новых записей')
+        created = self.load_users()
+        print(f'БД пополнена списком users.json: {created} новых записей')
+
+    def load_users(self):
+        """Создает пользователей, которых еще нет в БД."""
+        with open(
+            self.data_path('users.json'), 'r', encoding='utf-8'
+        ) as file:
+            data = json.load(file)
+        count = User.objects.count()
+        User.objects.bulk_create(
+            (User(**item) for item in data), ignore_conflicts=True
+        )
+        return User.objects.count() - count
+
+    @staticmethod
+    def scratch_model(model):
+        """Копия модели справочника с отдельной таблицей и теми же
+        ограничениями уникальности и индексами.
+        """
+        constraints = [constraint.clone() for constraint in
+                       model._meta.constraints]
+        indexes = [index.clone() for index in model._meta.indexes]
+        for item in constraints + indexes:
+            item.name = BENCHMARK_PREFIX + item.name
+        meta = type('Meta', (), {
+            'apps': Apps(),
+            'app_label': model._meta.app_label,
+            'db_table': BENCHMARK_PREFIX + model._meta.db_table,
+            'constraints': constraints,
+            'indexes': indexes,
+        })
+        fields = {
+            field.name: field.clone() for field in model._meta.local_fields
+        }
+        return type(f'Benchmark{model.__name__}', (models.Model,), {
+            '__module__': model.__module__, 'Meta': meta, **fields
+        })
+
+    def benchmark(self, is_postgresql):
+        """Замеряет загрузку справочников каждым способом в пустую
+        копию таблицы справочника, которая удаляется после замеров.
+        Таблицы справочников не меняются и не блокируются.
+        """
+        loaders = {'orm': self.orm_load}
+        if is_postgresql:
+            loaders['copy'] = self.copy_load
+        else:
+            print('COPY недоступен вне PostgreSQL, замеряется только ORM')
+        for model, json_file, fields in DICTIONARIES:
+            scratch = self.scratch_model(model)
+            with connection.schema_editor() as editor:
+                editor.create_model(scratch)
+            try:
+                for name, load in loaders.items():
+                    timings = []
+                    for _ in range(BENCHMARK_RUNS):
+                        scratch.objects.all().delete()
+                        started = time.perf_counter()
+                        created = load(scratch, json_file, fields)
+                        timings.append(time.perf_counter() - started)
+                    print(
+                        f'{json_file}, {name}: '
+                        f'{min(timings) * 1000:.1f} мс, '
+                        f'новых записей: {created}'
+                    )
+            finally:
+                with connection.schema_editor() as editor:
+                    editor.delete_model(scratch)
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+INDEXES = (
+    ('recipes_recipe_name_trgm_idx',
+     'recipes_recipe USING gin (UPPER(name::text) gin_trgm_ops)'),
+    ('recipes_ingredient_unit_trgm_idx',
+     'recipes_ingredient USING gin '
+     '(UPPER(measurement_unit::text) gin_trgm_ops)'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, definition in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {definition}'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
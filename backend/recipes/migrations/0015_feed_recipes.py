@@ -0,0 +1,51 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0014_shopping_cart_ingredients'),
+        ('users', '0002_myuser_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации рецепта')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в ленте',
+                'verbose_name_plural': 'Рецепты в ленте',
+                'ordering': ('user', '-pub_date', '-recipe'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='feedrecipe',
+            name='recipe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AddField(
+            model_name='feedrecipe',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_recipes', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='feedrecipe',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_recipe_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedrecipe',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='not_unique_user_recipe_feed'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:15
+
+from django.db import migrations
+
+from recipes.feed import rebuild_feeds
+
+
+def fill_feeds(apps, schema_editor):
+    rebuild_feeds(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_feed_recipes'),
+        ('users', '0004_myuser_feed_pull'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+# Индекс для поиска ингредиентов по началу названия в API. Поиск
+# выполняется по индексу в памяти процесса. Триграммный индекс
+# recipes_ingredient_name_trgm_idx остается для поиска в админке.
+INDEX_NAME = 'recipes_ingredient_name_prefix_idx'
+INDEX_DEFINITION = 'btree (UPPER(name::text) varchar_pattern_ops)'
+
+
+def drop_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+def create_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        f'ON recipes_ingredient USING {INDEX_DEFINITION}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0016_fill_feeds'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_prefix_index, create_prefix_index),
+    ]
@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import RegexValidator
 from django.db import models
 
@@ -79,6 +80,17 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Картинка рецепта', upload_to='recipes/images/'
     )
+    image_thumbnail = models.ImageField(
+        verbose_name='Миниатюра картинки', blank=True, editable=False
+    )
+    image_card = models.ImageField(
+        verbose_name='Картинка для карточки рецепта',
+        blank=True, editable=False
+    )
+    image_full = models.ImageField(
+        verbose_name='Картинка для страницы рецепта',
+        blank=True, editable=False
+    )
     text = models.TextField(verbose_name='Описание рецепта')
     cooking_time = models.PositiveSmallIntegerField(
         verbose_name='Время приготовления',
@@ -91,11 +103,32 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         verbose_name='Дата и время публикации рецепта', auto_now_add=True
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Раз добавлено в избранное', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Раз добавлено в корзину', default=0, editable=False
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор', null=True, editable=False
+    )
+    similar_outdated = models.BooleanField(
+        verbose_name='Похожие рецепты устарели', default=True, editable=False
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_id_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name[:20]
@@ -196,3 +229,106 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил в корзину {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    """Модель для хранения рецептов, похожих на данный по совместному
+    добавлению в избранное и корзину.
+    """
+    recipe = models.ForeignKey(
+        Recipe, verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='similar_recipes'
+    )
+    similar = models.ForeignKey(
+        Recipe, verbose_name='Похожий рецепт',
+        on_delete=models.CASCADE,
+        related_name='similar_to'
+    )
+    score = models.FloatField(verbose_name='Степень сходства')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe', '-score')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='not_unique_recipe_similar'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
+
+
+class ShoppingCartIngredient(models.Model):
+    """Модель для хранения суммарного количества ингредиентов
+    в корзине пользователя.
+    """
+    user = models.ForeignKey(
+        User, verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_ingredients'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, verbose_name='Ингредиент',
+        on_delete=models.CASCADE
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество'
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзине'
+        ordering = ('user',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='not_unique_user_ingredient_shopping_cart'
+            ),
+        )
+
+    def __str__(self):
+        return (
+            f'В корзине {self.user}: {self.ingredient.name} '
+            f'{self.total_amount} {self.ingredient.measurement_unit}'
+        )
+
+
+class FeedRecipe(models.Model):
+    """Модель для хранения ленты рецептов авторов, на которых подписан
+    пользователь. Рецепт записывается в ленты подписчиков при создании.
+    """
+    user = models.ForeignKey(
+        User, verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='feed_recipes'
+    )
+    recipe = models.ForeignKey(
+        Recipe, verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации рецепта')
+
+    class Meta:
+        verbose_name = 'Рецепт в ленте'
+        verbose_name_plural = 'Рецепты в ленте'
+        ordering = ('user', '-pub_date', '-recipe')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='not_unique_user_recipe_feed'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_recipe_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
@@ -0,0 +1,39 @@
+from django.apps import apps as global_apps
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connection
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+SEARCH_CONFIG = 'russian'
+
+
+def search_vector(apps=global_apps):
+    """Выражение поискового вектора рецепта: название, названия
+    ингредиентов и описание с убывающими весами.
+    """
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ingredient_names = Coalesce(Subquery(
+        RecipeIngredient.objects.filter(recipe=OuterRef('pk')).order_by(
+        ).values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    ), Value(''))
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(recipe_ids=None, apps=global_apps):
+    """Пересчитывает поисковые векторы рецептов recipe_ids или всех
+    рецептов. Вне PostgreSQL векторы не хранятся.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.all()
+    if recipe_ids is not None:
+        recipes = recipes.filter(pk__in=recipe_ids)
+    recipes.update(search_vector=search_vector(apps))
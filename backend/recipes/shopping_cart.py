@@ -0,0 +1,149 @@
+from itertools import islice
+
+from django.apps import apps as global_apps
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Greatest
+
+BATCH_SIZE = 1000
+
+
+def lock_users(user_ids, apps=global_apps):
+    """Блокирует пользователей до конца транзакции, чтобы изменения
+    корзины одного пользователя применялись по очереди.
+    """
+    User = apps.get_model('users', 'MyUser')
+    list(User.objects.select_for_update().filter(pk__in=user_ids).order_by(
+        'pk'
+    ).values_list('pk', flat=True))
+
+
+def lock_recipes(recipe_ids):
+    """Блокирует рецепты до конца транзакции, чтобы изменение
+    ингредиентов рецепта и добавление его в корзины или удаление
+    из них выполнялись по очереди. Рецепты блокируются раньше
+    пользователей. В СУБД без SELECT ... FOR UPDATE (SQLite) запись
+    и так блокирует всю БД, а чтение перед записью привело бы к ошибке
+    блокировки, поэтому там рецепты не блокируются.
+    """
+    if not connection.features.has_select_for_update:
+        return
+    Recipe = global_apps.get_model('recipes', 'Recipe')
+    list(Recipe.objects.select_for_update().filter(pk__in=recipe_ids).order_by(
+        'pk'
+    ).values_list('pk', flat=True))
+
+
+def carting_users(recipe_ids):
+    """id пользователей, у которых рецепты recipe_ids в корзине."""
+    ShoppingCart = global_apps.get_model('recipes', 'ShoppingCart')
+    return list(ShoppingCart.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by().values_list('user_id', flat=True).distinct())
+
+
+def recipe_deltas(recipe_ids, sign=1):
+    """Изменения количеств ингредиентов корзины при добавлении
+    (sign=1) или удалении (sign=-1) рецептов recipe_ids.
+    """
+    RecipeIngredient = global_apps.get_model('recipes', 'RecipeIngredient')
+    return {
+        ingredient_id: sign * amount
+        for ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values_list('ingredient_id').annotate(
+            total_amount=Sum('amount')
+        )
+    }
+
+
+def apply_cart_deltas(user_ids, deltas):
+    """Изменяет суммарные количества ингредиентов в корзинах
+    пользователей user_ids на deltas ({id ингредиента: изменение}).
+    Недостающие строки создаются, обнулившиеся удаляются.
+    """
+    ShoppingCartIngredient = global_apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    with transaction.atomic():
+        lock_users(user_ids)
+        rows = ShoppingCartIngredient.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        )
+        existing = set(rows.values_list('user_id', 'ingredient_id'))
+        if existing:
+            rows.update(total_amount=Greatest(
+                F('total_amount') + Case(
+                    *(
+                        When(ingredient_id=pk, then=Value(delta))
+                        for pk, delta in deltas.items()
+                    ),
+                    output_field=IntegerField()
+                ),
+                Value(0)
+            ))
+        ShoppingCartIngredient.objects.bulk_create(
+            (
+                ShoppingCartIngredient(
+                    user_id=user_id, ingredient_id=pk, total_amount=delta
+                )
+                for user_id in user_ids for pk, delta in deltas.items()
+                if delta > 0 and (user_id, pk) not in existing
+            ),
+            batch_size=BATCH_SIZE
+        )
+        if existing and min(deltas.values()) < 0:
+            rows.filter(total_amount=0).delete()
+
+
+def cart_totals(user_ids=None, apps=global_apps):
+    """Запрос суммарных количеств ингредиентов в корзинах,
+    посчитанных заново по рецептам.
+    """
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    if user_ids is None:
+        totals = RecipeIngredient.objects.filter(
+            recipe__shopping_cart__isnull=False
+        )
+    else:
+        totals = RecipeIngredient.objects.filter(
+            recipe__shopping_cart__user_id__in=user_ids
+        )
+    return totals.order_by().values_list(
+        'recipe__shopping_cart__user_id', 'ingredient_id'
+    ).annotate(total_amount=Sum('amount'))
+
+
+def rebuild_cart_totals(user_ids=None, apps=global_apps):
+    """Пересчитывает суммарные количества ингредиентов в корзинах
+    пользователей user_ids или всех пользователей.
+    """
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    rows = ShoppingCartIngredient.objects.all()
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        rows = rows.filter(user_id__in=user_ids)
+    with transaction.atomic():
+        if user_ids is not None:
+            lock_users(user_ids, apps)
+        rows.delete()
+        totals = cart_totals(user_ids, apps).iterator()
+        while True:
+            batch = list(islice(totals, BATCH_SIZE))
+            if not batch:
+                break
+            ShoppingCartIngredient.objects.bulk_create(
+                ShoppingCartIngredient(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=total_amount
+                )
+                for user_id, ingredient_id, total_amount in batch
+            )
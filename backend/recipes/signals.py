@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.cache import bump_model_version
+from recipes.counters import update_counter
+from recipes.feed import push_recipes
+from recipes.images import schedule_image_variants
+from recipes.models import (FavoriteRecipe, Ingredient, Recipe,
+                            RecipeIngredient, ShoppingCart, Tag, User)
+from recipes.search import update_search_vectors
+from recipes.shopping_cart import (apply_cart_deltas, lock_recipes,
+                                   recipe_deltas)
+
+CACHED_MODELS = (Ingredient, RecipeIngredient, Tag)
+SEARCH_FIELDS = {'name', 'text'}
+
+
+def model_changed(sender, **kwargs):
+    """Сбрасывает кеши модели после фиксации транзакции."""
+    transaction.on_commit(lambda: bump_model_version(sender))
+
+
+for model in CACHED_MODELS:
+    post_save.connect(model_changed, sender=model)
+    post_delete.connect(model_changed, sender=model)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        update_counter(User, instance.author_id, 'recipes_count', 1)
+        push_recipes((instance,))
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        update_search_vectors((instance.pk,))
+    schedule_image_variants(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    update_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors(RecipeIngredient.objects.filter(
+            ingredient=instance
+        ).values('recipe_id'))
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    update_search_vectors((instance.recipe_id,))
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+def favorite_created(sender, instance, created, **kwargs):
+    if created:
+        update_counter(
+            Recipe, instance.recipe_id, 'favorites_count', 1,
+            similar_outdated=True
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+def favorite_deleted(sender, instance, **kwargs):
+    update_counter(
+        Recipe, instance.recipe_id, 'favorites_count', -1,
+        similar_outdated=True
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def shopping_cart_created(sender, instance, created, **kwargs):
+    if not created:
+        return
+    with transaction.atomic():
+        lock_recipes((instance.recipe_id,))
+        update_counter(
+            Recipe, instance.recipe_id, 'in_carts_count', 1,
+            similar_outdated=True
+        )
+        apply_cart_deltas(
+            (instance.user_id,), recipe_deltas((instance.recipe_id,))
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def shopping_cart_deleting(sender, instance, **kwargs):
+    # Ингредиенты рецепта еще не удалены, даже если корзина удаляется
+    # вместе с рецептом.
+    lock_recipes((instance.recipe_id,))
+    apply_cart_deltas(
+        (instance.user_id,), recipe_deltas((instance.recipe_id,), -1)
+    )
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_deleted(sender, instance, **kwargs):
+    update_counter(
+        Recipe, instance.recipe_id, 'in_carts_count', -1,
+        similar_outdated=True
+    )
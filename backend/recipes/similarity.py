@@ -0,0 +1,117 @@
+from functools import reduce
+from operator import or_
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from scipy import sparse
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart, SimilarRecipe
+
+BATCH_SIZE = 1000
+
+
+def load_interactions():
+    """Возвращает разреженную матрицу пользователи x рецепты с единицами
+    для рецептов в избранном или корзине пользователя и id рецептов,
+    соответствующих ее столбцам.
+    """
+    pairs = np.array([
+        pair
+        for model in (FavoriteRecipe, ShoppingCart)
+        for pair in model.objects.order_by().values_list(
+            'user_id', 'recipe_id'
+        ).iterator()
+    ], dtype=np.int64).reshape(-1, 2)
+    user_ids, users = np.unique(pairs[:, 0], return_inverse=True)
+    recipe_ids, recipes = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(pairs)), (users, recipes)),
+        shape=(len(user_ids), len(recipe_ids))
+    )
+    # Рецепт и в избранном, и в корзине пользователя считается один раз.
+    matrix.data[:] = 1
+    return matrix.tocsc(), recipe_ids
+
+
+def similar_for(batch, matrix, recipe_ids, top_k):
+    """Рецепты, похожие на рецепты batch, по косинусной мере совместной
+    встречаемости у одних и тех же пользователей.
+
+    Совместная встречаемость считается одним произведением разреженных
+    матриц на весь пакет. Возвращает тройки (id рецепта, id похожего
+    рецепта, степень сходства).
+    """
+    columns = np.searchsorted(recipe_ids, batch)
+    found = columns < len(recipe_ids)
+    columns, batch = columns[found], batch[found]
+    # Рецепты без пользователей не попадают в столбцы матрицы.
+    columns = columns[recipe_ids[columns] == batch]
+    norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+    cooccurrence = (matrix[:, columns].T @ matrix).tocsr()
+    for row, column in enumerate(columns):
+        start, end = cooccurrence.indptr[row], cooccurrence.indptr[row + 1]
+        similar = cooccurrence.indices[start:end]
+        scores = cooccurrence.data[start:end] / (
+            norms[column] * norms[similar]
+        )
+        other = similar != column
+        similar, scores = similar[other], scores[other]
+        if len(scores) > top_k:
+            top = np.argpartition(-scores, top_k)[:top_k]
+            similar, scores = similar[top], scores[top]
+        for similar_column, score in zip(similar, scores):
+            yield (
+                int(recipe_ids[column]), int(recipe_ids[similar_column]),
+                float(score)
+            )
+
+
+def compute_similar_recipes(full=False, top_k=None):
+    """Пересчитывает похожие рецепты и возвращает число пересчитанных.
+
+    По умолчанию пересчитываются только рецепты, помеченные как
+    устаревшие при изменении избранного или корзин, и рецепты, которые
+    есть в избранном или корзинах их пользователей. Пометка снимается
+    после записи каждого пакета и только у рецептов, счетчики которых
+    не изменились с загрузки данных, поэтому прерванный расчет
+    и изменения во время расчета попадут в следующий запуск.
+    """
+    top_k = top_k or settings.RECIPE_SIMILAR_TOP_K
+    outdated = {
+        row.pop('pk'): row for row in Recipe.objects.filter(
+            similar_outdated=True
+        ).values('pk', 'favorites_count', 'in_carts_count')
+    }
+    matrix, recipe_ids = load_interactions()
+    if full:
+        batch_ids = set(Recipe.objects.values_list('pk', flat=True))
+    else:
+        batch_ids = set(outdated)
+        columns = np.flatnonzero(np.isin(recipe_ids, list(outdated)))
+        users = matrix[:, columns].nonzero()[0]
+        batch_ids.update(
+            recipe_ids[matrix[np.unique(users)].nonzero()[1]].tolist()
+        )
+    batch_ids = sorted(batch_ids)
+    for start in range(0, len(batch_ids), BATCH_SIZE):
+        batch = batch_ids[start:start + BATCH_SIZE]
+        rows = [
+            SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                          score=score)
+            for recipe_id, similar_id, score in similar_for(
+                np.array(batch, dtype=np.int64), matrix, recipe_ids, top_k
+            )
+        ]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=batch).delete()
+            SimilarRecipe.objects.bulk_create(rows)
+        unchanged = [
+            Q(pk=pk, **outdated[pk]) for pk in batch if pk in outdated
+        ]
+        if unchanged:
+            Recipe.objects.filter(reduce(or_, unchanged)).update(
+                similar_outdated=False
+            )
+    return len(batch_ids)
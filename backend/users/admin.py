@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from api.paginators import CachedCountPaginator
 from users.models import MyUser, Subscription
 
 
@@ -13,6 +14,8 @@ class MyUserAdmin(UserAdmin):
     list_editable = ('is_staff',)
     list_filter = ('is_staff', 'is_active')
     list_display_links = ('username',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
 
 
 class SubscriptionAdmin(admin.ModelAdmin):
@@ -23,6 +26,13 @@ class SubscriptionAdmin(admin.ModelAdmin):
         'user__username', 'user__email',
         'subscribed__username', 'subscribed__email'
     )
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'user', 'subscribed'
+        )
 
     def user_email(self, obj):
         return obj.user.email
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+INDEXES = (
+    ('users_myuser_username_trgm_idx',
+     'users_myuser USING gin (UPPER(username::text) gin_trgm_ops)'),
+    ('users_myuser_email_trgm_idx',
+     'users_myuser USING gin (UPPER(email::text) gin_trgm_ops)'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, definition in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {definition}'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_myuser_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_myuser_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='myuser',
+            name='feed_pull',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Рецепты добавляются в ленты при чтении'),
+        ),
+    ]
@@ -33,6 +33,16 @@ class MyUser(AbstractUser):
         verbose_name='Фамилия',
         max_length=150,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов', default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков', default=0, editable=False
+    )
+    feed_pull = models.BooleanField(
+        verbose_name='Рецепты добавляются в ленты при чтении',
+        default=False, editable=False
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import update_counter
+from recipes.feed import push_authors, remove_authors
+from users.models import MyUser, Subscription
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    if created:
+        update_counter(MyUser, instance.subscribed_id, 'followers_count', 1)
+        push_authors(instance.user_id, (instance.subscribed_id,))
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, **kwargs):
+    update_counter(MyUser, instance.subscribed_id, 'followers_count', -1)
+    remove_authors(instance.user_id, (instance.subscribed_id,))